@@ -1,4 +1,5 @@
 import os
+import pytest
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
@@ -37,3 +38,10 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_without_pool(settings):
+    # mock_media удаляет MEDIA_ROOT в конце теста, а потоки пула
+    # пережили бы и его, и тестовую базу
+    settings.THUMBNAIL_WORKERS = 0
@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import holes  # noqa: F401
+        from . import timing
+        from .sqlite import apply_pragmas
+
+        connection_created.connect(apply_pragmas)
+        timing.install()
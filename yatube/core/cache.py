@@ -0,0 +1,235 @@
+"""Двухуровневый кэш: LRU в памяти процесса над общим бэкендом.
+
+Чтение сначала идёт в локальный LRU процесса и только при промахе —
+в общий кэш (`OPTIONS['SHARED']`, псевдоним из `CACHES`), найденное
+значение запоминается локально. Локальный уровень ограничен объёмом
+(`MAX_BYTES`, считается по размеру pickle) и коротким TTL
+(`LOCAL_TIMEOUT`): значения, изменённые другим процессом, видны
+не позже чем через TTL.
+
+Для ключей, которые меняются на месте и должны быть видны всем
+процессам сразу (номера поколений вроде `posts:feed-generation`),
+есть `SHARED_ONLY` — префиксы ключей, которые локально не хранятся.
+Остальные ключи в проекте включают номер поколения, поэтому их
+смена сама делает старые локальные копии ненужными.
+
+`clear()` меняет эпоху в общем кэше; каждый процесс сверяет её
+не чаще раза в `EPOCH_INTERVAL` секунд и при смене сбрасывает
+свой локальный уровень. `stats()` отдаёт попадания, промахи
+и вытеснения локального уровня.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+EPOCH_KEY = 'two-tier:epoch'
+
+_MISSING = object()
+
+
+class _LocalTier:
+    """Данные локального уровня, общие для всех потоков процесса."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.epoch = None
+        self.epoch_checked = 0
+        self.stats = dict.fromkeys(
+            ('local_hits', 'shared_hits', 'misses', 'evictions'), 0
+        )
+
+
+# Django создаёт экземпляр бэкенда на каждый поток, а локальный
+# уровень должен быть один на процесс, как у LocMemCache
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.max_bytes = options.get('MAX_BYTES', 8 * 1024 * 1024)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.shared_only = tuple(options.get('SHARED_ONLY', ()))
+        self.epoch_interval = options.get('EPOCH_INTERVAL', 1)
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location, _LocalTier())
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _is_local(self, key):
+        return not (self.shared_only and key.startswith(self.shared_only))
+
+    def _count(self, name, amount=1):
+        with self._tier.lock:
+            self._tier.stats[name] += amount
+
+    def _local_expiry(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None or timeout > self.local_timeout:
+            timeout = self.local_timeout
+        return time.monotonic() + timeout if timeout > 0 else None
+
+    def _remember(self, key, version, value, timeout=DEFAULT_TIMEOUT):
+        if not self._is_local(key):
+            return
+        expires = self._local_expiry(timeout)
+        local_key = self.make_key(key, version)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._tier.lock:
+            self._forget(local_key)
+            if expires is None or len(data) > self.max_bytes:
+                return
+            self._tier.entries[local_key] = (expires, data)
+            self._tier.bytes += len(data)
+            while self._tier.bytes > self.max_bytes:
+                _, (_, evicted) = self._tier.entries.popitem(last=False)
+                self._tier.bytes -= len(evicted)
+                self._tier.stats['evictions'] += 1
+
+    def _forget(self, local_key):
+        entry = self._tier.entries.pop(local_key, None)
+        if entry is not None:
+            self._tier.bytes -= len(entry[1])
+
+    def _recall(self, key, version):
+        if not self._is_local(key):
+            return _MISSING
+        local_key = self.make_key(key, version)
+        with self._tier.lock:
+            entry = self._tier.entries.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires <= time.monotonic():
+                self._forget(local_key)
+                return _MISSING
+            self._tier.entries.move_to_end(local_key)
+            self._tier.stats['local_hits'] += 1
+        return pickle.loads(data)
+
+    def _drop(self, key, version):
+        with self._tier.lock:
+            self._forget(self.make_key(key, version))
+
+    def _check_epoch(self):
+        now = time.monotonic()
+        if now - self._tier.epoch_checked < self.epoch_interval:
+            return
+        self._tier.epoch_checked = now
+        epoch = self.shared.get(EPOCH_KEY)
+        if epoch != self._tier.epoch:
+            self._tier.epoch = epoch
+            self.clear_local()
+
+    def get(self, key, default=None, version=None):
+        self._check_epoch()
+        value = self._recall(key, version)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('shared_hits')
+        self._remember(key, version, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check_epoch()
+        found, remaining = {}, []
+        for key in keys:
+            value = self._recall(key, version)
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        if remaining:
+            shared = self.shared.get_many(remaining, version)
+            self._count('shared_hits', len(shared))
+            self._count('misses', len(remaining) - len(shared))
+            for key, value in shared.items():
+                self._remember(key, version, value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_epoch()
+        self.shared.set(key, value, timeout, version)
+        self._remember(key, version, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_epoch()
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, version, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._drop(key, version)
+        return self.shared.add(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        if self._recall(key, version) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._drop(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self._drop(key, version)
+        return self.shared.decr(key, delta, version)
+
+    def delete(self, key, version=None):
+        self._drop(key, version)
+        self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._drop(key, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        """Очищает общий кэш и локальные уровни всех процессов."""
+        self.shared.clear()
+        self._tier.epoch = time.time_ns()
+        self.shared.set(EPOCH_KEY, self._tier.epoch, None)
+        self.clear_local()
+
+    def clear_local(self):
+        with self._tier.lock:
+            self._tier.entries.clear()
+            self._tier.bytes = 0
+
+    def stats(self):
+        """Счётчики локального уровня этого процесса."""
+        tier = self._tier
+        with tier.lock:
+            stats = dict(
+                tier.stats, entries=len(tier.entries), bytes=tier.bytes
+            )
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['local_hit_rate'] = round(
+            stats['local_hits'] / lookups, 4
+        ) if lookups else 0.0
+        return stats
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
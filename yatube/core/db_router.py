@@ -0,0 +1,152 @@
+"""Чтение с реплик базы и привязка к основной базе после записи.
+
+`ReplicaRouter` отправляет все записи в `default`, а чтения —
+на реплику из `settings.DATABASE_REPLICAS`, но только внутри
+представлений, явно помеченных `read_from_replica`: лент и страниц
+поста, которые ничего не пишут. Реплика выбирается случайно один раз на запрос,
+чтобы все чтения страницы видели один и тот же снимок данных.
+Сессия и пользователь читаются с основной базы до переключения,
+код с записью оборачивается в `primary()`. Остальные представления,
+команды и миграции читают с основной базы.
+
+После POST и других изменяющих запросов, а также после GET-ссылок
+с записью (`pin_to_primary`), посетитель на `REPLICA_PIN_SECONDS`
+секунд получает cookie привязки: пока реплики догоняют основную
+базу, он читает с неё и видит собственные записи.
+
+На этот же срок полагается и кэш: метки версий (`version_token`)
+хранят время создания, и данные, прочитанные с реплики, сохраняются
+под версией только тогда, когда она старше этого срока (`may_cache`).
+Иначе на реплике может ещё не быть изменения, сменившего версию.
+"""
+import random
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_db = ContextVar('read_db', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_db.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+@contextmanager
+def primary():
+    """Чтения внутри блока идут в основную базу, даже на ленте."""
+    token = _read_db.set(None)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def version_token():
+    """Новая метка версии кэша: время создания и случайная часть."""
+    return f'{int(time.time() * 1000):x}-{secrets.token_hex(6)}'
+
+
+def is_settled(version):
+    """Старше ли все метки версии (через ':') `REPLICA_PIN_SECONDS`."""
+    deadline = (time.time() - settings.REPLICA_PIN_SECONDS) * 1000
+    try:
+        return all(
+            int(token.split('-', 1)[0], 16) <= deadline
+            for token in str(version).split(':')
+        )
+    except ValueError:
+        return False
+
+
+def may_cache(version):
+    """Можно ли сохранить под `version` прочитанное в этом запросе."""
+    return _read_db.get() is None or is_settled(version)
+
+
+def is_pinned(request):
+    try:
+        until = float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def pin(response):
+    """Ставит посетителю cookie чтения с основной базы."""
+    seconds = settings.REPLICA_PIN_SECONDS
+    response.set_cookie(
+        PIN_COOKIE,
+        str(time.time() + seconds),
+        max_age=seconds,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+def read_from_replica(view):
+    """Разрешает представлению без записи читать с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        aliases = replicas()
+        if (not aliases or request.method not in SAFE_METHODS
+                or is_pinned(request)):
+            return view(request, *args, **kwargs)
+        # Сессия и пользователь — с основной базы: на реплике может
+        # ещё не быть только что созданной сессии
+        user = getattr(request, 'user', None)
+        if user is not None:
+            user.is_authenticated
+        token = _read_db.set(random.choice(aliases))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_db.reset(token)
+    return wrapper
+
+
+def pin_to_primary(view):
+    """Привязка к основной базе после GET-представления с записью."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if replicas():
+            pin(response)
+        return response
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """Привязывает к основной базе после изменяющих запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and replicas():
+            pin(response)
+        return response
@@ -0,0 +1,166 @@
+"""Отдача медиафайлов с передачей файла фронт-серверу.
+
+Представление проверяет запрос (только GET/HEAD, путь внутри
+`MEDIA_ROOT` и под одним из `MEDIA_PUBLIC_PREFIXES`, без скрытых
+файлов) и ставит заголовки кэширования, а сами байты отдаёт
+фронт-сервер по `MEDIA_SENDFILE`:
+
+- `'x-accel'` — nginx, заголовок `X-Accel-Redirect` с путём
+  от `MEDIA_ACCEL_PREFIX` (internal location с alias на MEDIA_ROOT);
+- `'x-sendfile'` — Apache mod_xsendfile или lighttpd, абсолютный путь
+  в `X-Sendfile`;
+- `''` — без фронт-сервера: `FileResponse`, в том числе частями
+  по заголовку `Range`.
+
+Имена картинок постов и миниатюр sorl — хэши (`ab/cd/<hex>.ext`):
+файл под таким именем не меняется, поэтому кэшируется на год
+с `immutable`. Остальное — на `MEDIA_MAX_AGE` секунд.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import (ImproperlyConfigured,
+                                    SuspiciousFileOperation)
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+HASHED_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32,}(\.\w+)?$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def cache_control(name):
+    if HASHED_RE.search(name):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def resolve(path):
+    """Абсолютный путь к разрешённому файлу или Http404."""
+    path = posixpath.normpath(path).lstrip('/')
+    parts = path.split('/')
+    if (not path.startswith(tuple(settings.MEDIA_PUBLIC_PREFIXES))
+            or any(part.startswith('.') for part in parts)):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    return path, fullpath
+
+
+def parse_range(header, size):
+    """(начало, конец) из `Range: bytes=a-b`; None — отдать целиком.
+
+    Несколько диапазонов сразу не поддерживаются: браузерам для
+    картинок и видео хватает одного.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or not size:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class _FileRange:
+    """Файл, из которого читается только `length` байт."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def file_response(request, fullpath, stat, content_type):
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != http_date(stat.st_mtime):
+        # Файл изменился после первой части — отдаём целиком
+        byte_range = None
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            _FileRange(file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def sendfile_response(path, fullpath, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + path
+        )
+    elif settings.MEDIA_SENDFILE == 'x-sendfile':
+        response['X-Sendfile'] = fullpath
+    else:
+        raise ImproperlyConfigured(
+            f'Неизвестный MEDIA_SENDFILE: {settings.MEDIA_SENDFILE!r}'
+        )
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    path, fullpath = resolve(path)
+    stat = os.stat(fullpath)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+        stat.st_size,
+    ):
+        response = HttpResponseNotModified()
+    else:
+        content_type = (
+            mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+        )
+        if settings.MEDIA_SENDFILE:
+            response = sendfile_response(path, fullpath, content_type)
+        else:
+            response = file_response(request, fullpath, stat, content_type)
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    return response
@@ -0,0 +1,103 @@
+"""Кэш целых страниц с «дырами» для персональных фрагментов.
+
+Страница рендерится и кэшируется один раз для всех посетителей.
+Всё, что зависит от пользователя (шапка, кнопка подписки, форма
+комментария), выводится тегом `{% hole %}`: при рендере для кэша
+вместо фрагмента в страницу попадает метка, а при каждой отдаче
+метки заменяются фрагментами, отрисованными для текущего запроса.
+"""
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .db_router import may_cache
+
+HEADER = 'X-Page-Cache'
+HOLE_RE = re.compile(r'<!--hole:(?P<name>[\w.-]+):(?P<args>[\w=-]*)-->')
+
+_holes = {}
+
+
+def register_hole(name):
+    """Регистрирует функцию `(request, *args) -> str` для `{% hole %}`."""
+    def decorator(func):
+        _holes[name] = func
+        return func
+    return decorator
+
+
+def render_hole(request, name, args):
+    return _holes[name](request, *args)
+
+
+def hole_marker(name, args):
+    data = base64.urlsafe_b64encode(json.dumps(list(args)).encode())
+    return f'<!--hole:{name}:{data.decode()}-->'
+
+
+def fill_holes(request, content):
+    """Заменяет метки в странице фрагментами для текущего запроса."""
+    def replace(match):
+        args = json.loads(base64.urlsafe_b64decode(match['args']))
+        return render_hole(request, match['name'], args)
+    return HOLE_RE.sub(replace, content)
+
+
+def cache_public_page(timeout=None, version=None):
+    """Кэширует GET-ответы представления в общем для всех виде.
+
+    `version` — функция от аргументов представления; её значение
+    входит в ключ, так что смена версии делает сохранённые страницы
+    устаревшими. Страница, прочитанная с реплики, сохраняется, только
+    если версия не моложе задержки реплик (`db_router.may_cache`).
+    В заголовке `X-Page-Cache` отдаётся HIT или MISS.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            page_version = None
+            if version is not None:
+                page_version = version(*args, **kwargs)
+            key = 'public-page:{}:{}:{}'.format(
+                view.__module__ + '.' + view.__name__,
+                page_version or '',
+                path,
+            )
+            cached = cache.get(key)
+            if cached is None:
+                request.punch_holes = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request.punch_holes = False
+                if response.streaming:
+                    return response
+                content = response.content.decode(response.charset)
+                # Страницу с реплики нельзя сохранить под версией,
+                # изменения которой на реплике может ещё не быть
+                if response.status_code == 200 and (
+                    page_version is None or may_cache(page_version)
+                ):
+                    cache.set(
+                        key,
+                        (content, response['Content-Type']),
+                        timeout or settings.PAGE_CACHE_TIMEOUT,
+                    )
+                response[HEADER] = 'MISS'
+            else:
+                content, content_type = cached
+                response = HttpResponse(content_type=content_type)
+                response[HEADER] = 'HIT'
+            response.content = fill_holes(request, content)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+"""Постраничный вывод по курсору (keyset pagination).
+
+В отличие от `django.core.paginator.Paginator`, не считает `COUNT(*)`
+на каждом запросе и не пропускает строки через `OFFSET`: следующая
+страница выбирается условием по ключам сортировки последней записи,
+поэтому глубокие страницы отдаются так же быстро, как первая.
+"""
+import base64
+import hashlib
+import json
+from collections.abc import Sequence
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPaginator:
+    def __init__(self, object_list, per_page, keys=('-pub_date', '-id'),
+                 count_timeout=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+        self.count_timeout = count_timeout
+
+    @property
+    def _fields(self):
+        return [key.lstrip('-') for key in self.keys]
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field) for field in self._fields]
+        # isoformat() без округления: DjangoJSONEncoder отбрасывает
+        # микросекунды, и курсор перестал бы совпадать с pub_date
+        data = json.dumps(values, default=lambda value: value.isoformat())
+        data = data.encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            data = base64.urlsafe_b64decode(cursor + padding)
+            values = json.loads(data.decode())
+            if len(values) != len(self.keys):
+                raise InvalidCursor(cursor)
+            opts = self.object_list.model._meta
+            return [
+                opts.get_field(field).to_python(value)
+                for field, value in zip(self._fields, values)
+            ]
+        except InvalidCursor:
+            raise
+        except Exception as error:
+            raise InvalidCursor(cursor) from error
+
+    def _seek(self, values, reverse=False):
+        """Условие «строго после курсора» в порядке `keys`."""
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            field = key.lstrip('-')
+            descending = key.startswith('-') != reverse
+            lookup = f'{field}__lt' if descending else f'{field}__gt'
+            step = Q(**{lookup: values[index]})
+            for prev_field, prev_value in zip(self._fields, values[:index]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        return condition
+
+    def _ordering(self, reverse=False):
+        if not reverse:
+            return self.keys
+        return tuple(
+            key[1:] if key.startswith('-') else f'-{key}'
+            for key in self.keys
+        )
+
+    def page(self, after=None, before=None):
+        queryset = self.object_list
+        reverse = before is not None
+        cursor = before if reverse else after
+        if cursor is not None:
+            queryset = queryset.filter(
+                self._seek(self.decode_cursor(cursor), reverse=reverse)
+            )
+        rows = list(
+            queryset.order_by(*self._ordering(reverse))[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True,
+                              has_previous=has_more)
+        return CursorPage(rows, self, has_next=has_more,
+                          has_previous=after is not None)
+
+    def get_page(self, after=None, before=None):
+        """Как `page()`, но неверный курсор открывает первую страницу."""
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
+
+    @property
+    def count(self):
+        """Приблизительное число записей: `COUNT(*)`, кэшируемый на
+        `count_timeout` секунд. Без `count_timeout` не считается."""
+        if self.count_timeout is None:
+            return None
+        try:
+            sql = str(self.object_list.query)
+        except EmptyResultSet:
+            return 0
+        key = 'cursor-count:' + hashlib.md5(sql.encode()).hexdigest()
+        return cache.get_or_set(
+            key, self.object_list.count, self.count_timeout
+        )
+
+
+class CursorPage(Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        # Границы страницы запоминаются сразу: `object_list` можно
+        # подменить (например, загрузить посты по id), курсоры останутся.
+        self._first = object_list[0] if object_list else None
+        self._last = object_list[-1] if object_list else None
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and self._last is not None
+
+    def has_previous(self):
+        return self._has_previous and self._first is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self._last)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self._first)
@@ -0,0 +1,21 @@
+"""Настройки каждого нового соединения с SQLite.
+
+PRAGMA из `settings.SQLITE_PRAGMAS` выполняются по сигналу
+`connection_created`, то есть один раз на соединение; вместе
+с `CONN_MAX_AGE` соединение и его настройки живут между запросами.
+
+WAL позволяет читать во время записи, `synchronous=NORMAL` в WAL
+не теряет целостность, а только последние транзакции при сбое
+питания, `busy_timeout` заставляет писателя ждать блокировку вместо
+немедленной ошибки `database is locked`, а `mmap_size` и `cache_size`
+держат горячие страницы базы в памяти процесса.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
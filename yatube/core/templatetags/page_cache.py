@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import hole_marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Персональный фрагмент страницы: метка при рендере для кэша,
+    готовый фрагмент — в остальных случаях."""
+    request = context['request']
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(hole_marker(name, args))
+    return mark_safe(render_hole(request, name, args))
@@ -0,0 +1,38 @@
+from django import template
+
+register = template.Library()
+
+ELLIPSIS = '…'
+ON_EACH_SIDE = 3
+ON_ENDS = 2
+
+
+def elided_page_range(number, num_pages, on_each_side=ON_EACH_SIDE,
+                      on_ends=ON_ENDS):
+    """Номера страниц вокруг текущей и по краям, пропуски — многоточием.
+
+    Длина списка не зависит от числа страниц, поэтому навигация
+    по ленте в 50 тысяч страниц рендерится так же быстро, как по десяти.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
+
+
+@register.simple_tag
+def page_range(page_obj):
+    """`{% page_range page_obj as pages %}` — окно номеров страниц."""
+    return elided_page_range(page_obj.number, page_obj.paginator.num_pages)
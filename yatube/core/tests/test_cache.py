@@ -0,0 +1,79 @@
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.cache import TwoTierCache
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    def make_cache(self, location='', **options):
+        # Локальный уровень общий для одного LOCATION, поэтому у каждого
+        # теста свой
+        options = dict({'SHARED': 'shared', 'EPOCH_INTERVAL': 0}, **options)
+        return TwoTierCache(self.id() + location, {'OPTIONS': options})
+
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+        self.cache = self.make_cache()
+        self.cache.clear()
+
+    def test_reads_go_to_local_tier(self):
+        self.cache.set('ключ', 'значение')
+        self.shared.set('ключ', 'из другого процесса')
+        self.assertEqual(self.cache.get('ключ'), 'значение')
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+
+    def test_local_tier_expires(self):
+        cache = self.make_cache(LOCAL_TIMEOUT=0.01)
+        cache.set('ключ', 'значение')
+        self.shared.set('ключ', 'новое')
+        time.sleep(0.02)
+        self.assertEqual(cache.get('ключ'), 'новое')
+
+    def test_shared_only_keys(self):
+        cache = self.make_cache(SHARED_ONLY=['поколение'])
+        cache.set('поколение', 1)
+        cache.incr('поколение')
+        self.shared.incr('поколение')
+        self.assertEqual(cache.get('поколение'), 3)
+        self.assertEqual(cache.stats()['local_hits'], 0)
+
+    def test_get_many_fills_local_tier(self):
+        self.shared.set_many({'а': 1, 'б': 2})
+        self.assertEqual(
+            self.cache.get_many(['а', 'б', 'в']), {'а': 1, 'б': 2}
+        )
+        self.assertEqual(self.cache.get_many(['а', 'б']), {'а': 1, 'б': 2})
+        stats = self.cache.stats()
+        self.assertEqual(
+            (stats['shared_hits'], stats['misses'], stats['local_hits']),
+            (2, 1, 2),
+        )
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        cache = self.make_cache('budget', MAX_BYTES=1000)
+        value = 'x' * 300
+        cache.set('первый', value)
+        cache.set('второй', value)
+        cache.get('первый')
+        cache.set('третий', value)
+        cache.set('четвёртый', value)
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 1000)
+        self.assertEqual(stats['evictions'], 1)
+        self.shared.delete_many(['первый', 'второй'])
+        self.assertEqual(cache.get('первый'), value)
+        self.assertIsNone(cache.get('второй'))
+
+    def test_clear_invalidates_other_processes(self):
+        other = self.make_cache('other-process')
+        other.set('ключ', 'значение')
+        self.cache.clear()
+        self.assertIsNone(other.get('ключ'))
+
+    def test_tier_shared_between_instances(self):
+        self.cache.set('ключ', 'значение')
+        self.shared.delete('ключ')
+        self.assertEqual(self.make_cache().get('ключ'), 'значение')
@@ -0,0 +1,181 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.db_router import (PIN_COOKIE, ReplicaMiddleware, ReplicaRouter,
+                            is_settled, may_cache, pin_to_primary, primary,
+                            read_from_replica, version_token)
+from core.page_cache import HEADER, cache_public_page
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.read_db = None
+
+        def view(request):
+            self.read_db = router.db_for_read(Post)
+            self.write_db = router.db_for_write(Post)
+            return HttpResponse()
+
+        self.view = view
+        self.feed = read_from_replica(view)
+        self.middleware = ReplicaMiddleware(self.feed)
+
+    def test_marked_view_reads_from_replica(self):
+        self.middleware(self.factory.get('/'))
+        self.assertEqual(self.read_db, 'replica0')
+        self.assertEqual(self.write_db, 'default')
+
+    def test_other_views_read_from_primary(self):
+        ReplicaMiddleware(self.view)(self.factory.get('/'))
+        self.assertEqual(self.read_db, 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_primary_block_inside_replica_view(self):
+        def view(request):
+            with primary():
+                self.read_db = router.db_for_read(Post)
+            return HttpResponse()
+
+        read_from_replica(view)(self.factory.get('/'))
+        self.assertEqual(self.read_db, 'default')
+
+    def test_write_request_pins_to_primary(self):
+        response = self.middleware(self.factory.post('/'))
+        self.assertEqual(self.read_db, 'default')
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = cookie.value
+        self.middleware(request)
+        self.assertEqual(self.read_db, 'default')
+
+    def test_get_view_with_writes_pins_to_primary(self):
+        response = pin_to_primary(self.view)(self.factory.get('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_expired_pin_reads_from_replica(self):
+        for value in (str(time.time() - 1), 'мусор'):
+            with self.subTest(value=value):
+                request = self.factory.get('/')
+                request.COOKIES[PIN_COOKIE] = value
+                self.middleware(request)
+                self.assertEqual(self.read_db, 'replica0')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        response = self.middleware(self.factory.post('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = pin_to_primary(self.view)(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.middleware(self.factory.get('/'))
+        self.assertEqual(self.read_db, 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(ReplicaRouter().allow_migrate('replica0', 'posts'))
+        self.assertTrue(ReplicaRouter().allow_migrate('default', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'], REPLICA_PIN_SECONDS=10)
+class ReplicaCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_fresh_version_is_not_settled(self):
+        fresh = version_token()
+        with mock.patch('core.db_router.time.time', return_value=0):
+            old = version_token()
+        self.assertFalse(is_settled(fresh))
+        self.assertTrue(is_settled(old))
+        self.assertFalse(is_settled(f'{old}:{fresh}'))
+        self.assertFalse(is_settled('мусор'))
+
+    def test_may_cache_fresh_version_only_from_primary(self):
+        fresh = version_token()
+        self.assertTrue(may_cache(fresh))
+        results = []
+
+        def view(request):
+            results.append(may_cache(fresh))
+            with primary():
+                results.append(may_cache(fresh))
+            return HttpResponse()
+
+        read_from_replica(view)(self.factory.get('/'))
+        self.assertEqual(results, [False, True])
+
+    def test_replica_page_is_not_cached_under_fresh_version(self):
+        version = version_token()
+
+        @read_from_replica
+        @cache_public_page(version=lambda: version)
+        def view(request):
+            return HttpResponse('лента')
+
+        for _ in range(2):
+            response = view(self.factory.get('/'))
+            self.assertEqual(response[HEADER], 'MISS')
+
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            view(self.factory.get('/'))
+            self.assertEqual(view(self.factory.get('/'))[HEADER], 'HIT')
+
+
+class ReplicaViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    # Реплика — та же тестовая база: проверяется только выбор реплики
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_read_only_pages_use_replica(self):
+        pages = {
+            'posts:index': {},
+            'posts:group_list': {'slug': 'group'},
+            'posts:profile': {'username': 'author'},
+            'posts:post_detail': {'post_id': self.post.pk},
+            'posts:post_comments': {'post_id': self.post.pk},
+            'posts:follow_index': {},
+            'posts:search': {},
+        }
+        for name, kwargs in pages.items():
+            with self.subTest(page=name), mock.patch(
+                'core.db_router.random.choice', return_value='default'
+            ) as choice:
+                self.client.get(reverse(name, kwargs=kwargs))
+                choice.assert_called_once()
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_writing_pages_stay_on_primary(self):
+        url = reverse('posts:profile_follow', kwargs={'username': 'author'})
+        with mock.patch('core.db_router.random.choice') as choice:
+            response = self.client.get(url)
+        choice.assert_not_called()
+        self.assertIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,94 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from posts.models import Post
+from ..paginator import CursorPaginator
+from ..templatetags.pagination import elided_page_range
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост № {i}', author=cls.user) for i in range(25)
+        )
+        # bulk_create ставит всем постам почти одинаковое время:
+        # порядок внутри совпадающих дат задаёт id
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walks_forward_and_back(self):
+        first = self.paginator.get_page()
+        self.assertEqual(list(first), self.expected[:10])
+        self.assertFalse(first.has_previous())
+        second = self.paginator.get_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.expected[10:20])
+        third = self.paginator.get_page(after=second.next_cursor)
+        self.assertEqual(list(third), self.expected[20:])
+        self.assertFalse(third.has_next())
+        back = self.paginator.get_page(before=third.previous_cursor)
+        self.assertEqual(list(back), self.expected[10:20])
+        self.assertTrue(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_keeps_position_on_equal_pub_date(self):
+        Post.objects.update(pub_date=self.expected[0].pub_date)
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(after=first.next_cursor)
+        ids = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(set(ids)), 20)
+
+    def test_invalid_cursor_opens_first_page(self):
+        page = self.paginator.get_page(after='не-курсор')
+        self.assertEqual(list(page), self.expected[:10])
+
+    def test_approximate_count(self):
+        self.assertIsNone(self.paginator.count)
+        paginator = CursorPaginator(Post.objects.all(), 10, count_timeout=60)
+        self.assertEqual(paginator.count, 25)
+        Post.objects.all()[0].delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 25)
+
+
+class ElidedPageRangeTest(TestCase):
+    def render(self, num_pages, number):
+        page_obj = Paginator(range(num_pages * 10), 10).page(number)
+        return render_to_string(
+            'posts/includes/paginator.html', {'page_obj': page_obj}
+        )
+
+    def test_window_around_current_page(self):
+        self.assertEqual(
+            elided_page_range(50, 100),
+            [1, 2, '…', 47, 48, 49, 50, 51, 52, 53, '…', 99, 100],
+        )
+        self.assertEqual(
+            elided_page_range(1, 100),
+            [1, 2, 3, 4, '…', 99, 100],
+        )
+        self.assertEqual(elided_page_range(3, 5), [1, 2, 3, 4, 5])
+
+    def test_render_does_not_grow_with_page_count(self):
+        timings = {}
+        for num_pages in (10, 50000):
+            with self.subTest(num_pages=num_pages):
+                start = time.perf_counter()
+                html = self.render(num_pages, 5)
+                timings[num_pages] = time.perf_counter() - start
+                self.assertLessEqual(html.count('<li'), 4 + 13)
+        # Грубая проверка: без окна 50 тысяч ссылок рендерились бы
+        # на порядки дольше десяти
+        self.assertLess(timings[50000], timings[10] * 10 + 0.05)
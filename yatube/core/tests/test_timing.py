@@ -0,0 +1,87 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.template.base import Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+EXTERNAL_IP = '192.0.2.1'
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def metrics(self, response):
+        return {
+            part.split(';')[0].strip(): part
+            for part in response['Server-Timing'].split(',')
+        }
+
+    def test_header_counts_queries_templates_and_cache(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        metrics = self.metrics(response)
+        self.assertRegex(metrics['db'], r'desc="[1-9]\d* queries";dur=')
+        self.assertRegex(metrics['tpl'], r'dur=\d')
+        self.assertRegex(metrics['total'], r'dur=\d')
+        misses = int(re.search(r'miss=(\d+)', metrics['cache'])[1])
+        self.assertGreater(misses, 0)
+        response = self.guest_client.get(reverse('posts:index'))
+        metrics = self.metrics(response)
+        self.assertIn('db;desc="0 queries"', metrics['db'])
+        self.assertRegex(metrics['cache'], r'hit=[1-9]')
+
+    def test_structured_log_line(self):
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.guest_client.get(reverse('posts:index'))
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual(data['url_name'], 'posts:index')
+        self.assertEqual(data['status'], 200)
+        self.assertGreater(data['db_count'], 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATES={'posts:index': 0})
+    def test_sampling_by_url_name(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'auth'})
+        )
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    def test_hooks_installed_on_startup(self):
+        self.assertTrue(Template.render.timed)
+        self.assertTrue(type(caches['default']).get.timed)
+
+    def test_header_only_for_staff_and_internal_ips(self):
+        url = reverse('posts:index')
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        staff_client = Client(REMOTE_ADDR=EXTERNAL_IP)
+        staff_client.force_login(staff)
+        cases = (
+            (self.guest_client, True),
+            (Client(REMOTE_ADDR=EXTERNAL_IP), False),
+            (staff_client, True),
+        )
+        for client, shown in cases:
+            with self.subTest(shown=shown):
+                response = client.get(url)
+                self.assertEqual(response.has_header('Server-Timing'), shown)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_header_for_everyone_when_enabled(self):
+        response = Client(REMOTE_ADDR=EXTERNAL_IP).get(reverse('posts:index'))
+        self.assertTrue(response.has_header('Server-Timing'))
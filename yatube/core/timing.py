@@ -0,0 +1,192 @@
+"""Замеры запроса для заголовка Server-Timing и журнала.
+
+`ServerTimingMiddleware` включает замер для выбранных запросов и
+собирает в `Timing` число и время SQL-запросов, время рендера
+шаблонов, попадания и промахи кэша и общее время ответа. Запросы
+к базе считает `connection.execute_wrapper`, рендер и кэш — обёртки,
+которые `CoreConfig.ready()` один раз ставит на `Template.render`
+и `get`/`get_many` используемых бэкендов кэша. Вне замера обёртки
+только проверяют контекстную переменную и ничего не считают.
+
+Замеры всегда пишутся в журнал, а заголовок получают только
+сотрудники и запросы с `INTERNAL_IPS`; всем остальным — только
+при `SERVER_TIMING_HEADER = True`.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger('core.timing')
+
+_current = ContextVar('timing', default=None)
+_MISSING = object()
+
+
+class Timing:
+    def __init__(self, url_name):
+        self.url_name = url_name
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_count += 1
+            self.db_time += time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def header(self):
+        return ', '.join((
+            f'db;desc="{self.db_count} queries";dur={self.db_time * 1000:.1f}',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+    def as_dict(self):
+        return {
+            'url_name': self.url_name,
+            'db_count': self.db_count,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        timing = _current.get()
+        if timing is None:
+            return render(self, context)
+        # Вложенные шаблоны (include, extends) уже входят во внешний
+        timing.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timing.template_depth -= 1
+            if not timing.template_depth:
+                timing.template_time += time.perf_counter() - start
+    wrapper.timed = True
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        timing = _current.get()
+        if timing is not None:
+            if value is _MISSING:
+                timing.cache_misses += 1
+            else:
+                timing.cache_hits += 1
+        return default if value is _MISSING else value
+    wrapper.timed = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        timing = _current.get()
+        if timing is not None:
+            timing.cache_hits += len(found)
+            timing.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.timed = True
+    return wrapper
+
+
+def install():
+    """Ставит обёртки на рендер шаблонов и бэкенды кэша (один раз)."""
+    if not getattr(Template.render, 'timed', False):
+        Template.render = _timed_render(Template.render)
+    # Общий уровень двухуровневого кэша уже учтён в верхнем
+    layers = {
+        getattr(caches[alias], 'shared_alias', None)
+        for alias in settings.CACHES
+    }
+    for alias in settings.CACHES:
+        if alias in layers:
+            continue
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'timed', False):
+            backend.get = _counted_get(backend.get)
+        if not getattr(backend.get_many, 'timed', False):
+            backend.get_many = _counted_get_many(backend.get_many)
+
+
+def sample_rate(url_name):
+    rates = getattr(settings, 'SERVER_TIMING_SAMPLE_RATES', {})
+    return rates.get(url_name, settings.SERVER_TIMING_SAMPLE_RATE)
+
+
+def shows_header(request):
+    """Можно ли отдать замеры этому посетителю."""
+    if settings.SERVER_TIMING_HEADER:
+        return True
+    if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+class ServerTimingMiddleware:
+    """Замеряет выборку запросов: Server-Timing и строка журнала."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            url_name = resolve(request.path_info).view_name
+        except Resolver404:
+            url_name = None
+        rate = sample_rate(url_name)
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+
+        timing = Timing(url_name)
+        token = _current.set(timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing.finish()
+        if shows_header(request):
+            response['Server-Timing'] = timing.header()
+        data = timing.as_dict()
+        data.update(
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+        )
+        logger.info(json.dumps(data, ensure_ascii=False), extra=data)
+        return response
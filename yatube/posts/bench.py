@@ -0,0 +1,293 @@
+"""Синтетические данные и замеры для нагрузочного сравнения релизов.
+
+`seed` заполняет базу пользователями, группами, постами, комментариями
+и подписками пачками; посты и комментарии вставляются через
+`importer.insert_raw`, чтобы `auto_now_add` не заменил их даты,
+разбросанные на `DATE_SPREAD`. Популярность авторов распределена
+по степенному закону (закон Ципфа): немногие авторы получают
+большую часть подписчиков, а немногие посты — большую часть
+комментариев, как в живой сети. Тексты берутся из заранее
+сгенерированного Faker пула фраз, чтобы генерация не упиралась в Faker.
+
+`run` открывает страницы `posts` тестовым клиентом и возвращает
+p50/p95 времени ответа и число SQL-запросов для каждой, а с
+двухуровневым кэшем — ещё попадания в его уровни.
+"""
+import random
+import statistics
+import time
+from array import array
+from contextlib import ExitStack
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from . import importer, search, stats, timeline
+from .cache import bump_all_pages
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'bench'
+BATCH_SIZE = 5000
+TEXT_POOL = 1000
+DATE_SPREAD = timedelta(days=365)
+# Адрес не из INTERNAL_IPS: иначе при DEBUG каждый ответ
+# инструментирует debug_toolbar
+CLIENT_ADDR = '192.0.2.1'
+
+
+class PowerLaw:
+    """Случайный элемент списка с вероятностью, обратной его номеру.
+
+    Номер считается как n ** u при равномерном u: такое распределение
+    даёт закон Ципфа с показателем 1 без таблицы весов в памяти.
+    """
+
+    def __init__(self, items, rng):
+        self.items = items
+        self.rng = rng
+
+    def __call__(self):
+        count = len(self.items)
+        rank = min(int((count + 1) ** self.rng.random()), count)
+        return self.items[rank - 1]
+
+
+def _insert(model, objects, batch_size=BATCH_SIZE, raw=False, **kwargs):
+    """Вставляет объекты пачками; `raw` — в обход `pre_save` полей,
+    чтобы `auto_now_add` не затирал заданные даты."""
+    objects = iter(objects)
+    count = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return count
+        # Пачка — одна транзакция, иначе SQLite фиксирует каждую строку
+        with transaction.atomic():
+            if raw:
+                importer.insert_raw(model, batch)
+            else:
+                model.objects.bulk_create(batch, **kwargs)
+        count += len(batch)
+
+
+def _ids(queryset):
+    return array('q', queryset.order_by('pk').values_list('pk', flat=True))
+
+
+def seed(users, groups, posts, comments, follows, seed=None,
+         progress=None):
+    """Создаёт набор данных; возвращает число созданных записей."""
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    texts = [fake.paragraph() for _ in range(TEXT_POOL)]
+    now = timezone.now()
+    progress = progress or (lambda message: None)
+    created = {}
+
+    password = make_password(None)
+    start = User.objects.filter(
+        username__startswith=USERNAME_PREFIX
+    ).count()
+    created['users'] = _insert(User, (
+        User(
+            username=f'{USERNAME_PREFIX}{start + i}',
+            first_name=fake.first_name(),
+            password=password,
+        )
+        for i in range(users)
+    ))
+    user_ids = _ids(
+        User.objects.filter(username__startswith=USERNAME_PREFIX)
+    )
+    progress(f'пользователей: {created["users"]}')
+
+    start = Group.objects.filter(slug__startswith=USERNAME_PREFIX).count()
+    created['groups'] = _insert(Group, (
+        Group(
+            title=f'Группа {start + i}',
+            slug=f'{USERNAME_PREFIX}-{start + i}',
+            description=rng.choice(texts),
+        )
+        for i in range(groups)
+    ))
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    progress(f'групп: {created["groups"]}')
+
+    # Активность авторов и число их подписчиков распределены
+    # независимо: иначе самые плодовитые авторы были бы и самыми
+    # читаемыми, и ленты подписок росли бы квадратично
+    writers = list(user_ids)
+    rng.shuffle(writers)
+    active = PowerLaw(writers, rng)
+    popular = PowerLaw(user_ids, rng)
+    created['posts'] = _insert(Post, (
+        Post(
+            author_id=active(),
+            text=rng.choice(texts),
+            group_id=rng.choice(group_ids) if group_ids else None,
+            pub_date=now - DATE_SPREAD * rng.random(),
+            updated=now,
+        )
+        for _ in range(posts)
+    ), raw=True)
+    post_ids = _ids(Post.objects.all())
+    progress(f'постов: {created["posts"]}')
+
+    # Обсуждают в основном свежие посты: id растут со временем вставки
+    hot_posts = PowerLaw(post_ids[::-1], rng)
+    created['comments'] = _insert(Comment, (
+        Comment(
+            post_id=hot_posts(),
+            author_id=rng.choice(user_ids),
+            text=rng.choice(texts),
+            created=now - DATE_SPREAD * rng.random(),
+        )
+        for _ in range(comments)
+    ), raw=True) if post_ids else 0
+    progress(f'комментариев: {created["comments"]}')
+
+    def follow_pairs():
+        for user_id in user_ids:
+            count = min(int(rng.paretovariate(1.5) * follows / 3), 1000)
+            for author_id in {popular() for _ in range(count)}:
+                if author_id != user_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+    created['follows'] = _insert(
+        Follow, follow_pairs(), ignore_conflicts=True
+    ) if follows else 0
+    progress(f'подписок: {created["follows"]}')
+    return created
+
+
+def rebuild_derived():
+    """Ленты, счётчики и поиск для данных, вставленных без сигналов."""
+    # Счётчики подписчиков нужны лентам, чтобы не раскладывать
+    # посты популярных авторов
+    stats.reconcile()
+    timeline.rebuild()
+    if search.is_available():
+        search.rebuild()
+    bump_all_pages()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def targets():
+    """Страницы для замера: (название, URL, нужен ли вход)."""
+    author = User.objects.order_by('-stats__posts_count').first()
+    reader = User.objects.order_by('-stats__following_count').first()
+    group = Group.objects.order_by('-pk').first()
+    post = Post.objects.order_by('-pub_date').first()
+    pages = max(Post.objects.count() // 10, 1)
+    urls = [
+        ('index', reverse('posts:index'), None),
+        ('index_deep', reverse('posts:index') + f'?page={pages // 2}', None),
+        ('index_last', reverse('posts:index') + f'?page={pages}', None),
+    ]
+    if group is not None:
+        urls.append(('group', reverse(
+            'posts:group_list', kwargs={'slug': group.slug}
+        ), None))
+    if author is not None:
+        urls.append(('profile', reverse(
+            'posts:profile', kwargs={'username': author.username}
+        ), None))
+    if post is not None:
+        urls.append(('post_detail', reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}
+        ), None))
+    if reader is not None:
+        urls.append(('follow', reverse('posts:follow_index'), reader))
+    return urls
+
+
+def run(repeat, cold=False, names=None):
+    """Замеряет страницы; возвращает {название: метрики}."""
+    results = {}
+    for name, url, user in targets():
+        if names and name not in names:
+            continue
+        client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        if user is not None:
+            client.force_login(user)
+        client.get(url)
+        timings, queries = [], []
+        before = cache_stats()
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            # Запросы считаются на всех базах, в том числе репликах
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connection))
+                    for connection in connections.all()
+                ]
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(sum(len(context) for context in captured))
+        results[name] = {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'queries': max(queries),
+        }
+        if before is not None:
+            results[name]['cache'] = cache_delta(before, cache_stats())
+    return results
+
+
+def cache_stats():
+    """Счётчики двухуровневого кэша, если он настроен."""
+    stats = getattr(cache, 'stats', None)
+    return stats() if stats is not None else None
+
+
+def cache_delta(before, after):
+    delta = {
+        name: after[name] - before[name]
+        for name in ('local_hits', 'shared_hits', 'misses', 'evictions')
+    }
+    lookups = delta['local_hits'] + delta['shared_hits'] + delta['misses']
+    delta['local_hit_rate'] = round(
+        delta['local_hits'] / lookups, 4
+    ) if lookups else 0.0
+    return delta
+
+
+def compare(old, new):
+    """Строки сравнения двух замеров: время и запросы, было → стало."""
+    lines = []
+    for name, metrics in new.items():
+        before = old.get(name)
+        if before is None:
+            lines.append(f'{name}: новая страница')
+            continue
+        change = (metrics['p50_ms'] - before['p50_ms']) / max(
+            before['p50_ms'], 1e-6
+        )
+        lines.append(
+            f'{name}: p50 {before["p50_ms"]} → {metrics["p50_ms"]} мс '
+            f'({change:+.0%}), p95 {before["p95_ms"]} → '
+            f'{metrics["p95_ms"]} мс, запросов {before["queries"]} → '
+            f'{metrics["queries"]}'
+        )
+    return lines
@@ -0,0 +1,187 @@
+"""Кэш лент с инвалидацией по поколению.
+
+Ключи кэшированных лент включают номер поколения, который
+меняется при любом изменении постов, групп, комментариев
+и имён авторов. После изменения старые записи просто перестают
+читаться и вытесняются по TTL, поэтому TTL можно держать большим,
+а новые посты всё равно видны сразу.
+
+Поколение лент целиком нужно только главной и поиску: на них может
+оказаться любой пост. Страницы группы, профиля и поста версионируются
+по показанным на них объектам (`page_version`): у каждого поста,
+автора и группы своя метка, и комментарий к одному посту не сбрасывает
+страницы остальных.
+
+Поколение — случайная метка, а не счётчик: `incr` у FileBasedCache —
+это чтение и запись, и два одновременных увеличения дали бы одно
+и то же число. Метка меняется сразу и ещё раз после фиксации
+транзакции: до фиксации параллельный запрос мог прочитать старые
+данные и сохранить их уже под новой меткой.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from core.db_router import may_cache, primary, version_token
+from .models import Group, Post, User
+
+GENERATION_KEY = 'posts:feed-generation'
+# Общая часть версий всех страниц: её меняют команды, которые пишут
+# в базу пачками, минуя сигналы
+EPOCH_KEY = f'{GENERATION_KEY}:epoch'
+
+
+def new_generation():
+    # Случайная метка не совпадёт ни с одной прежней, даже если ключ
+    # поколения был вытеснен из кэша; время в ней нужно для реплик
+    return version_token()
+
+
+def feed_generation():
+    """Текущее поколение лент."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, new_generation(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation(*keys):
+    def bump():
+        cache.set_many(dict.fromkeys(keys, new_generation()), None)
+
+    # Сразу — чтобы сама транзакция не читала старый кэш, после
+    # фиксации — чтобы выбросить то, что успели сохранить до неё
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def bump_feed_generation():
+    """Делает недействительными все кэшированные ленты."""
+    bump_generation(GENERATION_KEY)
+
+
+def _version_key(kind, pk):
+    # Префикс поколения: TwoTierCache не держит такие ключи локально
+    return f'{GENERATION_KEY}:{kind}:{pk}'
+
+
+def object_versions(scopes):
+    """Метки объектов `[('post', 1), ('author', 2), ...]` одной строкой."""
+    keys = [EPOCH_KEY] + [
+        _version_key(kind, pk) for kind, pk in scopes if pk is not None
+    ]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, new_generation(), None)
+        found.update(cache.get_many(missing))
+    return ':'.join(str(found.get(key, '')) for key in keys)
+
+
+def bump_object_versions(scopes):
+    """Делает недействительными страницы, где показаны эти объекты."""
+    keys = {_version_key(kind, pk) for kind, pk in scopes if pk is not None}
+    if keys:
+        bump_generation(*keys)
+
+
+def bump_all_pages():
+    """Сбрасывает ленты и страницы всех объектов, например после импорта."""
+    bump_generation(GENERATION_KEY, EPOCH_KEY)
+
+
+def _scopes_key(kind, name):
+    digest = hashlib.md5(str(name).encode()).hexdigest()
+    return f'posts:page-scopes:{kind}:{digest}'
+
+
+def page_scopes(kind, name, compute):
+    """Объекты страницы по её адресу (slug, имени, id поста).
+
+    Считаются одним запросом и хранятся в кэше, чтобы отдача страницы
+    из кэша обходилась без базы; сбрасывает их `forget_page_scopes`
+    при сохранении и удалении объекта.
+    """
+    key = _scopes_key(kind, name)
+    scopes = cache.get(key)
+    if scopes is None:
+        # Сбрасываются при записи, поэтому читаются с основной базы:
+        # с отстающей реплики в кэш попал бы уже сброшенный набор
+        with primary():
+            scopes = compute()
+        cache.set(key, scopes, settings.FEED_CACHE_TIMEOUT)
+    return scopes
+
+
+def forget_page_scopes(kind, name):
+    cache.delete(_scopes_key(kind, name))
+
+
+def group_version(slug):
+    return object_versions(page_scopes('group', slug, lambda: [(
+        'group',
+        Group.objects.filter(slug=slug).values_list('pk', flat=True).first(),
+    )]))
+
+
+def profile_version(username):
+    return object_versions(page_scopes('profile', username, lambda: [(
+        'author',
+        User.objects.filter(
+            username=username
+        ).values_list('pk', flat=True).first(),
+    )]))
+
+
+def _post_scopes(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if row is None:
+        return []
+    author_id, group_id = row
+    return [('post', post_id), ('author', author_id), ('group', group_id)]
+
+
+def post_version(post_id):
+    """Версия страницы поста: сам пост, его автор и группа."""
+    return object_versions(
+        page_scopes('post', post_id, lambda: _post_scopes(post_id))
+    )
+
+
+def page_cache_key(request, page_obj):
+    """Ключ страницы ленты: поколение и номер страницы или курсор."""
+    if getattr(page_obj, 'is_cursor', False):
+        position = 'after={}&before={}'.format(
+            request.GET.get('after', ''), request.GET.get('before', '')
+        )
+    else:
+        position = page_obj.number
+    return f'{feed_generation()}:{position}'
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который хранит COUNT(*) в кэше до смены поколения."""
+
+    def __init__(self, object_list, per_page, cache_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+
+    @cached_property
+    def count(self):
+        generation = feed_generation()
+        key = f'posts:feed-count:{self.cache_key}:{generation}'
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            if may_cache(generation):
+                cache.set(key, count, settings.FEED_CACHE_TIMEOUT)
+        return count
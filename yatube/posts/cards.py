@@ -0,0 +1,62 @@
+"""Кэш отрендеренных карточек постов для лент.
+
+Карточка поста одинакова на главной, в группе, профиле, подписках
+и поиске. Ключ карточки — id поста и хэш всего, что в неё выводится
+(текст, дата, картинка, имя автора, группа, число комментариев):
+при любом изменении ключ меняется сам, а старая карточка вытесняется
+по TTL. Лента страницы собирается одним `get_many`, рендерятся
+и сохраняются одним `set_many` только недостающие карточки;
+миниатюры для них достаются заранее одной пачкой. Карточки, у которых
+миниатюры ещё не готовы, рендерятся каждый раз и не кэшируются.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import thumbnails
+
+TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post):
+    group = post.group
+    version = repr((
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name,
+        post.author.username,
+        post.author.get_full_name(),
+        group and (group.slug, group.title),
+        getattr(post, 'comment_count', None),
+    ))
+    digest = hashlib.md5(version.encode()).hexdigest()
+    return f'post-card:{post.pk}:{digest}'
+
+
+def render_cards(posts):
+    """HTML карточек постов в том же порядке."""
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    thumbnails.prefetch(
+        post for key, post in zip(keys, posts) if key not in cards
+    )
+    missing = {
+        key: post for key, post in zip(keys, posts) if key not in cards
+    }
+    rendered = {
+        key: render_to_string(TEMPLATE, {'post': post})
+        for key, post in missing.items()
+    }
+    # Пока миниатюры не готовы (или не получились), карточка выходит
+    # без картинки — такую не кэшируем, иначе она застрянет до TTL
+    complete = {
+        key: html for key, html in rendered.items()
+        if not missing[key].image or missing[key].image_variants
+    }
+    if complete:
+        cache.set_many(complete, settings.POST_CARD_CACHE_TIMEOUT)
+    cards.update(rendered)
+    return [cards[key] for key in keys]
@@ -0,0 +1,120 @@
+"""Валидаторы условных GET для страниц постов.
+
+ETag страницы — хэш адреса, посетителя (в страницу попадают его
+шапка, кнопки и форма) и состояния показанных объектов: полей
+автора или группы, счётчиков, числа постов и последнего
+`Post.updated`, а для поста — ещё числа комментариев и id
+последнего. Состояние читается одним-двумя запросами по индексам
+и кэшируется до смены версии страницы (`posts.cache`), так что
+повторная проверка обходится без базы. Если браузер прислал тот же
+ETag, `condition` отвечает 304, не вызывая представление: ни запросов ленты,
+ни рендера шаблонов.
+
+Главная показывает все посты, поэтому её состояние — само
+поколение лент.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from core.db_router import may_cache
+from .cache import (feed_generation, group_version, post_version,
+                    profile_version)
+from .models import Comment, Group, Post, User
+
+
+def make_etag(request, *state):
+    """Слабый ETag: тело страницы отличается CSRF-токеном в формах."""
+    viewer = request.user.pk if request.user.is_authenticated else ''
+    data = repr((request.get_full_path(), viewer) + state)
+    return 'W/"{}"'.format(hashlib.md5(data.encode()).hexdigest())
+
+
+def cached_state(scope, version, compute):
+    """Состояние объекта, посчитанное один раз на версию страницы."""
+    key = f'posts:etag-state:{version}:{scope}'
+    state = cache.get(key)
+    if state is None:
+        state = compute()
+        if may_cache(version):
+            cache.set(key, state, settings.FEED_CACHE_TIMEOUT)
+    return state
+
+
+def _posts_state(posts):
+    state = posts.order_by().aggregate(
+        count=Count('id'), updated=Max('updated')
+    )
+    return state['count'], state['updated']
+
+
+def index_etag(request):
+    return make_etag(request, feed_generation())
+
+
+def _group_state(slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'title', 'description'
+    ).first()
+    if group is None:
+        return None
+    return group, _posts_state(Post.objects.filter(group_id=group[0]))
+
+
+def _profile_state(username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'first_name', 'last_name',
+        'stats__posts_count', 'stats__followers_count',
+        'stats__following_count',
+    ).first()
+    if author is None:
+        return None
+    return author, _posts_state(Post.objects.filter(author_id=author[0]))
+
+
+def _post_state(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'updated', 'text', 'image', 'group__slug', 'group__title',
+        'author__first_name', 'author__last_name',
+        'author__stats__posts_count',
+    ).first()
+    if post is None:
+        return None
+    comments = Comment.objects.filter(post_id=post_id).order_by().aggregate(
+        count=Count('id'), last=Max('id')
+    )
+    return post, comments['count'], comments['last']
+
+
+def group_etag(request, slug):
+    state = cached_state(
+        f'group:{slug}', group_version(slug), lambda: _group_state(slug)
+    )
+    return state and make_etag(request, state)
+
+
+def profile_etag(request, username):
+    state = cached_state(
+        f'profile:{username}',
+        profile_version(username),
+        lambda: _profile_state(username),
+    )
+    return state and make_etag(request, state)
+
+
+def _cached_post_state(post_id):
+    return cached_state(
+        f'post:{post_id}', post_version(post_id), lambda: _post_state(post_id)
+    )
+
+
+def post_etag(request, post_id):
+    state = _cached_post_state(post_id)
+    return state and make_etag(request, state)
+
+
+def post_last_modified(request, post_id):
+    state = _cached_post_state(post_id)
+    return state and state[0][0]
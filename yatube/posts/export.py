@@ -0,0 +1,100 @@
+"""Потоковая выгрузка постов автора или группы в JSONL и CSV.
+
+Посты читаются `.iterator()` пачками по `CHUNK_SIZE`, комментарии
+к пачке — одним запросом, поэтому память не растёт с числом постов.
+Поля совпадают с форматом `import_posts`: выгрузку можно загрузить
+обратно. В CSV комментарии идут отдельными строками с `type=comment`
+после своего поста, в JSONL — списком `comments` внутри поста.
+"""
+import csv
+import json
+from itertools import groupby, islice
+
+from .models import Comment
+
+CHUNK_SIZE = 1000
+FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_FIELDS = (
+    'type', 'id', 'author', 'text', 'group', 'pub_date', 'post', 'created',
+)
+
+
+def _post_record(row):
+    return {
+        'type': 'post',
+        'id': row['id'],
+        'author': row['author__username'],
+        'text': row['text'],
+        'group': row['group__slug'],
+        'pub_date': row['pub_date'].isoformat(),
+    }
+
+
+def _comment_record(row):
+    return {
+        'type': 'comment',
+        'id': row['id'],
+        'post': row['post_id'],
+        'author': row['author__username'],
+        'text': row['text'],
+        'created': row['created'].isoformat(),
+    }
+
+
+def _comments_for(post_ids):
+    comments = Comment.objects.filter(post_id__in=post_ids).order_by(
+        'post_id', 'created', 'id'
+    ).values('id', 'post_id', 'author__username', 'text', 'created')
+    return {
+        post_id: [_comment_record(row) for row in rows]
+        for post_id, rows in groupby(comments, key=lambda row: row['post_id'])
+    }
+
+
+def records(posts, with_comments=False):
+    """Посты в порядке публикации; комментарии — в ключе `comments`."""
+    rows = posts.order_by('pub_date', 'id').values(
+        'id', 'author__username', 'text', 'group__slug', 'pub_date'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    while True:
+        chunk = [_post_record(row) for row in islice(rows, CHUNK_SIZE)]
+        if not chunk:
+            return
+        comments = {}
+        if with_comments:
+            comments = _comments_for([record['id'] for record in chunk])
+        for record in chunk:
+            if with_comments:
+                record['comments'] = comments.get(record['id'], [])
+            yield record
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), CSV_FIELDS)
+    yield writer.writeheader()
+    for record in records:
+        comments = record.pop('comments', [])
+        yield writer.writerow(record)
+        for comment in comments:
+            yield writer.writerow(comment)
+
+
+def lines(posts, fmt, with_comments=False):
+    """Строки выгрузки в формате `fmt` (jsonl или csv)."""
+    writer = csv_lines if fmt == 'csv' else jsonl_lines
+    return writer(records(posts, with_comments))
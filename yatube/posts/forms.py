@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from . import images, thumbnails
 from .models import Post, Comment
 
 
@@ -19,6 +21,19 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Введите текст поста')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Уже сохранённую картинку (правка поста) не трогаем
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and post.image and 'image' in self.changed_data:
+            thumbnails.schedule(post.image.name)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,48 @@
+from django.template.loader import render_to_string
+
+from core.page_cache import register_hole
+from .forms import CommentForm
+from .models import Follow
+
+
+@register_hole('feed_switcher')
+def feed_switcher(request):
+    return render_to_string(
+        'posts/includes/switcher.html', request=request
+    )
+
+
+@register_hole('follow_button')
+def follow_button(request, author_id, username):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user,
+        author_id=author_id,
+    ).exists()
+    context = {
+        'author_id': author_id,
+        'username': username,
+        'following': following,
+    }
+    return render_to_string(
+        'posts/includes/follow_button.html', context, request=request
+    )
+
+
+@register_hole('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string(
+        'posts/includes/post_edit_link.html', {'post_id': post_id}
+    )
+
+
+@register_hole('comment_form')
+def comment_form(request, post_id):
+    context = {
+        'form': CommentForm(),
+        'post_id': post_id,
+    }
+    return render_to_string(
+        'posts/includes/comment_form.html', context, request=request
+    )
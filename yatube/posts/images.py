@@ -0,0 +1,68 @@
+"""Обработка картинок постов при загрузке.
+
+Оригинал сохраняется один раз уже подготовленным: повёрнутым по
+EXIF, без метаданных (координаты, модель телефона) и уменьшенным
+до `POST_IMAGE_MAX_SIZE`. Тогда каждой миниатюре не приходится
+декодировать двадцатимегабайтную фотографию. Анимированные
+и прочие форматы, кроме JPEG, PNG и WebP, сохраняются как есть.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+FORMATS = ('JPEG', 'PNG', 'WEBP')
+# Всё прочее из метаданных (EXIF, XMP, комментарии) отбрасывается
+KEEP_INFO = ('icc_profile', 'transparency')
+ORIENTATION = 0x0112
+# Значения ORIENTATION, при которых поворот меняет ширину и высоту
+SWAPS_SIDES = (5, 6, 7, 8)
+
+
+def _save_options(image, fmt):
+    options = {}
+    # Цветовой профиль ничего не говорит о съёмке, а без него
+    # поплывут цвета на широких экранах
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if fmt == 'JPEG':
+        options.update(
+            quality=settings.POST_IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+    elif fmt == 'WEBP':
+        options.update(quality=settings.POST_IMAGE_QUALITY)
+    else:
+        options.update(optimize=True)
+    return options
+
+
+def normalize(upload):
+    """Подготовленная копия загруженной картинки или она сама."""
+    upload.seek(0)
+    image = Image.open(upload)
+    fmt = image.format
+    if fmt not in FORMATS or getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+    # Сначала уменьшаем, потом поворачиваем: поворот декодирует
+    # картинку целиком, а thumbnail() на ещё не прочитанном JPEG через
+    # draft() декодирует её сразу в уменьшенном в 2–8 раз масштабе
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    if image.getexif().get(ORIENTATION) in SWAPS_SIDES:
+        max_size = max_size[::-1]
+    image.thumbnail(max_size, Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+    # PNG без exif= всё равно записывает info['exif']
+    image.info = {
+        key: value for key, value in image.info.items() if key in KEEP_INFO
+    }
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(output, fmt, **_save_options(image, fmt))
+    return SimpleUploadedFile(
+        upload.name, output.getvalue(), Image.MIME[fmt]
+    )
@@ -0,0 +1,324 @@
+"""Потоковый импорт групп, постов и комментариев из JSONL и CSV.
+
+Каждая строка файла — одна запись с полем `type`:
+
+* `group`: `slug`, `title`, `description`;
+* `post` (по умолчанию): `author` (username), `text`, необязательные
+  `id`, `group` (slug) и `pub_date` (ISO 8601);
+* `comment`: `post` (id поста), `author`, `text`, необязательные
+  `id` и `created`.
+
+В JSONL комментарии можно вложить в пост списком `comments`, как их
+выгружает `export_posts`; поле `post` у них тогда можно опустить.
+
+Файл читается построчно, записи вставляются пачками, каждая пачка —
+в своей транзакции. Авторы и группы ищутся по словарям в памяти,
+поэтому на запись не приходится ни одного лишнего запроса. Вставка
+идёт в обход `pre_save` полей, так что `auto_now_add` не подменяет
+даты из файла. В той же транзакции новые посты попадают в поисковый
+индекс и ленты подписчиков. После каждой пачки номер последней
+записи сохраняется в файл контрольной точки: прерванный импорт
+продолжается с него.
+"""
+import csv
+import json
+import os
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, timeline
+from .models import Comment, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('jsonl', 'csv')
+BATCH_SIZE = 1000
+# Сколько сообщений об ошибках хранить; остальные только считаются
+MAX_ERRORS = 20
+
+
+class BadRecord(ValueError):
+    pass
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'jsonl' if extension in ('json', 'jsonl', 'ndjson') else extension
+
+
+def read_records(path, fmt, start=0):
+    """Записи файла после `start` по одной: пары (номер записи,
+    словарь или ошибка)."""
+    with open(path, encoding='utf-8', newline='') as source:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(source), 1):
+                if number > start:
+                    yield number, {
+                        key: value for key, value in row.items()
+                        if value != ''
+                    }
+            return
+        for number, line in enumerate(source, 1):
+            # Уже импортированные строки пропускаем, не разбирая JSON
+            if number <= start or not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, BadRecord(f'некорректный JSON: {error}')
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)['position']
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, position):
+    # Пишем во временный файл и подменяем: при обрыве посреди
+    # записи остаётся предыдущая целая контрольная точка
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as checkpoint:
+        json.dump({'position': position}, checkpoint)
+    os.replace(temporary, path)
+
+
+def parse_date(value, now):
+    if not value:
+        return now
+    date = parse_datetime(value)
+    if date is None:
+        raise BadRecord(f'некорректная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def insert_raw(model, objects):
+    """Вставляет объекты как есть, пропуская конфликты по ключу.
+
+    В отличие от `bulk_create` не вызывает `pre_save` полей: даты
+    `auto_now_add` берутся из объектов, а сама модель не меняется,
+    поэтому соседние потоки по-прежнему получают текущее время.
+    """
+    db = router.db_for_write(model)
+    fields = model._meta.concrete_fields
+    with_pk = [obj for obj in objects if obj.pk is not None]
+    without_pk = [obj for obj in objects if obj.pk is None]
+    for batch, batch_fields in (
+        (with_pk, fields),
+        (without_pk, [f for f in fields if f is not model._meta.pk]),
+    ):
+        if not batch:
+            continue
+        size = max(
+            connections[db].ops.bulk_batch_size(batch_fields, batch), 1
+        )
+        for start in range(0, len(batch), size):
+            model._base_manager._insert(
+                batch[start:start + size],
+                fields=batch_fields,
+                using=db,
+                raw=True,
+                ignore_conflicts=True,
+            )
+
+
+def required(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        raise BadRecord(f'нет поля {field}')
+    return value
+
+
+def identifier(record, field):
+    """Целочисленный id из поля записи или None, если поля нет."""
+    value = record.get(field)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRecord(f'некорректный {field}: {value}')
+
+
+class Importer:
+    """Вставляет пачки записей; хранит словари авторов и групп."""
+
+    def __init__(self, create_users=False, derived=True,
+                 max_errors=MAX_ERRORS):
+        self.create_users = create_users
+        self.derived = derived
+        self.max_errors = max_errors
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.authors = set()
+        self.counts = Counter()
+        # Первые сообщения об ошибках; всего их counts['skipped']
+        self.errors = []
+
+    def skip(self, number, error):
+        self.counts['skipped'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f'запись {number}: {error}')
+
+    def _insert(self, model, objects):
+        """Вставляет ещё не существующие объекты; id новых строк."""
+        given = {obj.pk for obj in objects if obj.pk is not None}
+        existing = set(model.objects.filter(pk__in=given).values_list(
+            'pk', flat=True
+        ))
+        self.counts['existing'] += len(existing)
+        # Автоинкрементные id больше всех уже занятых, поэтому новые
+        # строки — это переданные id и всё, что выше прежнего максимума
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        insert_raw(model, [obj for obj in objects if obj.pk not in existing])
+        return set(model.objects.filter(
+            Q(pk__gt=last) | Q(pk__in=given - existing)
+        ).values_list('pk', flat=True))
+
+    def _add_users(self, usernames):
+        missing = usernames - self.users.keys()
+        if not missing or not self.create_users:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=password) for name in missing],
+            ignore_conflicts=True,
+        )
+        created = dict(User.objects.filter(username__in=missing).values_list(
+            'username', 'pk'
+        ))
+        self.users.update(created)
+        self.counts['user'] += len(created)
+
+    def _author(self, record):
+        username = required(record, 'author')
+        if username not in self.users:
+            raise BadRecord(f'нет пользователя {username}')
+        author_id = self.users[username]
+        self.authors.add(author_id)
+        return author_id
+
+    def _import_groups(self, records):
+        groups = {}
+        for number, record in records:
+            try:
+                slug = required(record, 'slug')
+                groups[slug] = Group(
+                    slug=slug,
+                    title=required(record, 'title'),
+                    description=record.get('description', ''),
+                )
+            except BadRecord as error:
+                self.skip(number, error)
+        new = [group for slug, group in groups.items()
+               if slug not in self.groups]
+        self.counts['existing'] += len(groups) - len(new)
+        Group.objects.bulk_create(new, ignore_conflicts=True)
+        self.groups.update(
+            Group.objects.filter(slug__in=groups).values_list('slug', 'pk')
+        )
+        self.counts['group'] += len(new)
+
+    def _import_posts(self, records, now):
+        self._add_users({
+            record['author'] for _, record in records if record.get('author')
+        })
+        posts = []
+        for number, record in records:
+            try:
+                slug = record.get('group')
+                if slug and slug not in self.groups:
+                    raise BadRecord(f'нет группы {slug}')
+                posts.append(Post(
+                    pk=identifier(record, 'id'),
+                    author_id=self._author(record),
+                    text=required(record, 'text'),
+                    group_id=self.groups.get(slug),
+                    pub_date=parse_date(record.get('pub_date'), now),
+                    updated=now,
+                ))
+            except BadRecord as error:
+                self.skip(number, error)
+        post_ids = self._insert(Post, posts)
+        self.counts['post'] += len(post_ids)
+        if self.derived and post_ids:
+            # bulk-вставка не шлёт сигналов: обновляем то, что они ведут,
+            # только для новых постов
+            if search.is_available():
+                search.index_posts(post_ids)
+            timeline.fan_out_posts(Post.objects.filter(pk__in=post_ids))
+
+    def _import_comments(self, records, now):
+        self._add_users({
+            record['author'] for _, record in records if record.get('author')
+        })
+        # Посты проверяем одним запросом на пачку, а не держим в памяти
+        referenced = {
+            int(record['post']) for _, record in records
+            if str(record.get('post', '')).isdigit()
+        }
+        post_ids = set(Post.objects.filter(pk__in=referenced).values_list(
+            'pk', flat=True
+        ))
+        comments = []
+        for number, record in records:
+            try:
+                required(record, 'post')
+                post_id = identifier(record, 'post')
+                if post_id not in post_ids:
+                    raise BadRecord(f'нет поста {post_id}')
+                comments.append(Comment(
+                    pk=identifier(record, 'id'),
+                    post_id=post_id,
+                    author_id=self._author(record),
+                    text=required(record, 'text'),
+                    created=parse_date(record.get('created'), now),
+                ))
+            except BadRecord as error:
+                self.skip(number, error)
+        self.counts['comment'] += len(self._insert(Comment, comments))
+
+    def import_batch(self, batch):
+        """Вставляет пачку в одной транзакции: группы, посты, комментарии."""
+        by_type = {'group': [], 'post': [], 'comment': []}
+        for number, record in batch:
+            if isinstance(record, BadRecord):
+                self.skip(number, record)
+                continue
+            kind = record.get('type', 'post')
+            if kind not in by_type:
+                self.skip(number, f'неизвестный тип {kind}')
+                continue
+            if kind == 'post':
+                try:
+                    comments = nested_comments(record)
+                except BadRecord as error:
+                    self.skip(number, error)
+                    continue
+                by_type['comment'] += [(number, c) for c in comments]
+            by_type[kind].append((number, record))
+        now = timezone.now()
+        with transaction.atomic():
+            self._import_groups(by_type['group'])
+            self._import_posts(by_type['post'], now)
+            self._import_comments(by_type['comment'], now)
+
+
+def nested_comments(record):
+    """Комментарии из списка `comments` поста (выгрузка в JSONL)."""
+    comments = record.pop('comments', None) or []
+    if not isinstance(comments, list) or not all(
+        isinstance(comment, dict) for comment in comments
+    ):
+        raise BadRecord('comments должен быть списком объектов')
+    return [{'post': record.get('id'), **comment} for comment in comments]
@@ -0,0 +1,308 @@
+"""Нагрузочный прогон WSGI-приложения без сервера и сети.
+
+Виртуальные пользователи вызывают `yatube.wsgi.application` напрямую,
+со своими cookie и CSRF-токеном, из пула потоков или процессов.
+Каждый шаг выбирается случайно по весам `SCENARIOS`: анонимный
+просмотр лент и постов, лента подписок, комментарий, новый пост.
+Итог — пропускная способность, гистограмма и перцентили задержек,
+доля ошибок по сценариям и число ошибок блокировки SQLite
+(`database is locked`), пойманных через `got_request_exception`.
+"""
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.urls import reverse
+
+from .models import Group, Post
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'load'
+PASSWORD = 'load-test-password'
+SAMPLE_SIZE = 1000
+# Границы корзин гистограммы, мс
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SCENARIOS = {
+    'browse': 60,
+    'follow_feed': 20,
+    'comment': 15,
+    'post': 5,
+}
+
+# Сигнал приходит в потоке запроса, поэтому счётчик у каждого
+# воркера свой и в потоках, и в процессах
+_local = threading.local()
+
+
+def _count_lock_errors(sender, request=None, **kwargs):
+    error = sys.exc_info()[1]
+    if isinstance(error, OperationalError) and 'locked' in str(error):
+        _local.lock_errors = getattr(_local, 'lock_errors', 0) + 1
+
+
+got_request_exception.connect(_count_lock_errors)
+
+
+class WSGIClient:
+    """Минимальный клиент WSGI: cookie, формы и заголовок CSRF."""
+
+    def __init__(self, application):
+        self.application = application
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        url = urlsplit(path)
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            # Адрес не из INTERNAL_IPS: иначе при DEBUG каждый ответ
+            # инструментирует debug_toolbar
+            'REMOTE_ADDR': '192.0.2.1',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_COOKIE': '; '.join(
+                f'{key}={morsel.value}' for key, morsel in self.cookies.items()
+            ),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if 'csrftoken' in self.cookies:
+            environ['HTTP_X_CSRFTOKEN'] = self.cookies['csrftoken'].value
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split()[0]))
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    self.cookies.load(value)
+
+        result = self.application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0]
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, data):
+        return self.request('POST', path, data)
+
+
+class VirtualUser:
+    """Один посетитель: свой клиент, вход по паролю и набор сценариев."""
+
+    def __init__(self, application, username, sample, rng):
+        self.client = WSGIClient(application)
+        self.username = username
+        self.sample = sample
+        self.rng = rng
+        self.logged_in = False
+
+    def login(self):
+        login = reverse('users:login')
+        self.client.get(login)
+        status = self.client.post(login, {
+            'username': self.username,
+            'password': PASSWORD,
+        })
+        self.logged_in = status == 302
+        return status
+
+    def browse(self):
+        path = self.rng.choice([
+            reverse('posts:index'),
+            reverse('posts:index') + f'?page={self.rng.randint(1, 50)}',
+            reverse('posts:group_list', kwargs={
+                'slug': self.rng.choice(self.sample['groups']),
+            }) if self.sample['groups'] else reverse('posts:index'),
+            reverse('posts:profile', kwargs={
+                'username': self.rng.choice(self.sample['authors']),
+            }),
+            reverse('posts:post_detail', kwargs={
+                'post_id': self.rng.choice(self.sample['posts']),
+            }),
+        ])
+        return self.client.get(path)
+
+    def follow_feed(self):
+        return self.client.get(reverse('posts:follow_index'))
+
+    def comment(self):
+        post_id = self.rng.choice(self.sample['posts'])
+        self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post_id})
+        )
+        return self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post_id}),
+            {'text': 'Комментарий нагрузочного теста'},
+        )
+
+    def post(self):
+        self.client.get(reverse('posts:post_create'))
+        return self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост нагрузочного теста'},
+        )
+
+
+# Ожидаемые статусы: записи отвечают редиректом на пост или профиль
+EXPECTED = {
+    'browse': {200},
+    'follow_feed': {200},
+    'comment': {302},
+    'post': {302},
+}
+
+
+def prepare(users):
+    """Создаёт пользователей теста и выбирает данные для сценариев."""
+    existing = set(User.objects.filter(
+        username__startswith=USERNAME_PREFIX
+    ).values_list('username', flat=True))
+    usernames = [f'{USERNAME_PREFIX}{i}' for i in range(users)]
+    template = User()
+    template.set_password(PASSWORD)
+    User.objects.bulk_create([
+        User(username=name, password=template.password)
+        for name in usernames if name not in existing
+    ])
+    return {
+        'usernames': usernames,
+        'authors': list(User.objects.filter(
+            posts__isnull=False
+        ).values_list('username', flat=True).distinct()[:SAMPLE_SIZE])
+        or usernames,
+        'groups': list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+        ),
+        'posts': list(
+            Post.objects.values_list('pk', flat=True)[:SAMPLE_SIZE]
+        ),
+    }
+
+
+def worker(index, usernames, sample, duration, seed):
+    """Цикл одного воркера; возвращает список (сценарий, статус, мс)."""
+    from yatube.wsgi import application
+
+    rng = random.Random(None if seed is None else seed + index)
+    users = [
+        VirtualUser(application, name, sample, rng) for name in usernames
+    ]
+    names, weights = zip(*SCENARIOS.items())
+    results = []
+    _local.lock_errors = 0
+    deadline = time.monotonic() + duration
+    try:
+        for user in users:
+            start = time.perf_counter()
+            status = user.login()
+            results.append(
+                ('login', status, (time.perf_counter() - start) * 1000)
+            )
+        while users and time.monotonic() < deadline:
+            user = rng.choice(users)
+            scenario = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = getattr(user, scenario)()
+            except Exception:
+                status = 0
+            results.append(
+                (scenario, status, (time.perf_counter() - start) * 1000)
+            )
+    finally:
+        connections.close_all()
+    return results, _local.lock_errors
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(results, elapsed, lock_errors):
+    """Сводка прогона: пропускная способность, задержки, ошибки."""
+    latencies = sorted(ms for _, _, ms in results)
+    histogram = Counter()
+    for ms in latencies:
+        bucket = next((edge for edge in BUCKETS if ms <= edge), None)
+        histogram[bucket] += 1
+    scenarios = defaultdict(lambda: {'requests': 0, 'errors': 0})
+    for scenario, status, _ in results:
+        scenarios[scenario]['requests'] += 1
+        expected = EXPECTED.get(scenario, {302})
+        if status not in expected:
+            scenarios[scenario]['errors'] += 1
+    errors = sum(item['errors'] for item in scenarios.values())
+    return {
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(results) / max(elapsed, 1e-6), 1),
+        'error_rate': round(errors / max(len(results), 1), 4),
+        'p50_ms': round(percentile(latencies, 0.5), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'histogram': [
+            [edge, histogram[edge]] for edge in BUCKETS + (None,)
+        ],
+        'scenarios': dict(scenarios),
+        'sqlite_lock_errors': lock_errors,
+    }
+
+
+def run(executor, workers, usernames, sample, duration, seed=None):
+    """Раздаёт пользователей воркерам и собирает результаты."""
+    connections.close_all()
+    chunks = [usernames[index::workers] for index in range(workers)]
+    started = time.monotonic()
+    futures = [
+        executor.submit(worker, index, chunk, sample, duration, seed)
+        for index, chunk in enumerate(chunks)
+    ]
+    results, lock_errors = [], 0
+    for future in futures:
+        worker_results, worker_locks = future.result()
+        results.extend(worker_results)
+        lock_errors += worker_locks
+    elapsed = time.monotonic() - started
+    return summarize(results, elapsed, lock_errors)
+
+
+def compare(old, new):
+    """Строки сравнения двух прогонов: было → стало."""
+    lines = []
+    for name in (
+        'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate',
+        'sqlite_lock_errors',
+    ):
+        before, after = old.get(name), new[name]
+        if before is None:
+            continue
+        change = (after - before) / before if before else 0
+        lines.append(f'{name}: {before} → {after} ({change:+.0%})')
+    return lines
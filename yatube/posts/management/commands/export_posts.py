@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты автора или группы в JSONL/CSV'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='username автора')
+        source.add_argument('--group', help='slug группы')
+        parser.add_argument(
+            '--format',
+            choices=tuple(export.FORMATS),
+            default='jsonl',
+            help='Формат выгрузки',
+        )
+        parser.add_argument(
+            '--comments',
+            action='store_true',
+            help='Добавить комментарии к постам',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для выгрузки; по умолчанию — стандартный вывод',
+        )
+
+    def handle(self, *args, **options):
+        if options['author']:
+            if not User.objects.filter(username=options['author']).exists():
+                raise CommandError(
+                    f'Пользователь не найден: {options["author"]}'
+                )
+            posts = Post.objects.filter(author__username=options['author'])
+        else:
+            if not Group.objects.filter(slug=options['group']).exists():
+                raise CommandError(f'Группа не найдена: {options["group"]}')
+            posts = Post.objects.filter(group__slug=options['group'])
+        lines = export.lines(posts, options['format'], options['comments'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,108 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer, stats
+from posts.cache import bump_all_pages
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Потоково импортирует группы, посты и комментарии из JSONL/CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями')
+        parser.add_argument(
+            '--format',
+            choices=importer.FORMATS,
+            help='Формат файла; по умолчанию — по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importer.BATCH_SIZE,
+            help='Записей в одной пачке и транзакции',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки; по умолчанию <path>.checkpoint',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить с сохранённой контрольной точки',
+        )
+        parser.add_argument(
+            '--create-users',
+            action='store_true',
+            help='Создавать отсутствующих авторов без пароля',
+        )
+        parser.add_argument(
+            '--skip-derived',
+            action='store_true',
+            help='Не обновлять ленты, счётчики и поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        fmt = options['format'] or importer.detect_format(path)
+        if fmt not in importer.FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {fmt}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть больше нуля')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        start = importer.read_checkpoint(checkpoint) if options[
+            'resume'
+        ] else 0
+
+        records = importer.read_records(path, fmt, start)
+        try:
+            imp = importer.Importer(
+                create_users=options['create_users'],
+                derived=not options['skip_derived'],
+            )
+            started = time.monotonic()
+            position = start
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                imp.import_batch(batch)
+                position = batch[-1][0]
+                importer.write_checkpoint(checkpoint, position)
+                self.report(position - start, started)
+        except FileNotFoundError as error:
+            raise CommandError(f'Файл не найден: {error.filename}')
+
+        counts = imp.counts
+        for error in imp.errors:
+            self.stderr.write(error)
+        if counts['skipped'] > len(imp.errors):
+            self.stderr.write(
+                f'... и ещё пропущено: {counts["skipped"] - len(imp.errors)}'
+            )
+        if not options['skip_derived'] and imp.authors:
+            # Ленты и поисковый индекс обновлены по пачкам
+            stats.reconcile(User.objects.filter(pk__in=imp.authors))
+            bump_all_pages()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён: групп {counts["group"]}, '
+            f'постов {counts["post"]}, комментариев {counts["comment"]}, '
+            f'новых авторов {counts["user"]}, '
+            f'уже были в базе {counts["existing"]}, '
+            f'пропущено {counts["skipped"]}; '
+            f'{self.rate(position - start, started)}'
+        ))
+
+    def rate(self, processed, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        return (
+            f'{processed} записей за {elapsed:.1f} с '
+            f'({processed / elapsed:.0f} записей/с)'
+        )
+
+    def report(self, processed, started):
+        if self.verbosity >= 2:
+            self.stdout.write(self.rate(processed, started))
@@ -0,0 +1,87 @@
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Нагружает WSGI-приложение смесью чтений и записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Параллельных воркеров',
+        )
+        parser.add_argument(
+            '--mode', choices=('thread', 'process'), default='thread',
+            help='Пул потоков или процессов',
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Виртуальных пользователей (делятся между воркерами)',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность прогона, с',
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Сохранить сводку в JSON')
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1 or options['users'] < workers:
+            raise CommandError(
+                'Нужен хотя бы один воркер и пользователь на каждого'
+            )
+        sample = loadtest.prepare(options['users'])
+        pool = (
+            ThreadPoolExecutor if options['mode'] == 'thread'
+            else ProcessPoolExecutor
+        )
+        with pool(max_workers=workers) as executor:
+            summary = loadtest.run(
+                executor, workers, sample['usernames'], sample,
+                options['duration'], options['seed'],
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(summary, output, ensure_ascii=False, indent=2)
+        self.report(summary)
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as old:
+                    previous = json.load(old)
+            except FileNotFoundError:
+                raise CommandError(f'Файл не найден: {options["compare"]}')
+            for line in loadtest.compare(previous, summary):
+                self.stdout.write(line)
+
+    def report(self, summary):
+        self.stdout.write(
+            f'Запросов: {summary["requests"]} за {summary["elapsed_s"]} с, '
+            f'{summary["throughput_rps"]} запросов/с, '
+            f'ошибок {summary["error_rate"]:.2%}, '
+            f'блокировок SQLite {summary["sqlite_lock_errors"]}'
+        )
+        self.stdout.write(
+            f'p50 {summary["p50_ms"]} мс, p95 {summary["p95_ms"]} мс, '
+            f'p99 {summary["p99_ms"]} мс'
+        )
+        peak = max((count for _, count in summary['histogram']), default=0)
+        for edge, count in summary['histogram']:
+            label = f'<= {edge} мс' if edge else '> ' + str(
+                loadtest.BUCKETS[-1]
+            ) + ' мс'
+            bar = '#' * round(40 * count / peak) if peak else ''
+            self.stdout.write(f'{label:>12} {count:>7} {bar}')
+        for name, item in sorted(summary['scenarios'].items()):
+            self.stdout.write(
+                f'{name}: {item["requests"]} запросов, '
+                f'{item["errors"]} ошибок'
+            )
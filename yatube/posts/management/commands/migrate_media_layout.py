@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from sorl.thumbnail import delete as delete_thumbnails
+
+from posts import storage
+from posts.cache import bump_all_pages
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога в раскладку '
+        'по хэшу содержимого и обновляет пути в базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Потоков для чтения, хэширования и копирования файлов',
+        )
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help='Не удалять файлы из старой раскладки',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('Пачка и число потоков должны быть больше 0')
+        self.storage = Post._meta.get_field('image').storage
+        moved = missing = 0
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                # Уже перенесённые посты пропускаются, поэтому прерванный
+                # перенос можно просто запустить заново
+                batch = list(
+                    Post.objects.filter(pk__gt=last_pk).exclude(image='')
+                    .order_by('pk').values_list('pk', 'image')
+                    [:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                batch = [
+                    (pk, name) for pk, name in batch
+                    if not storage.is_sharded(name)
+                ]
+                names = sorted({name for _, name in batch})
+                relocated = dict(zip(names, pool.map(
+                    lambda name: storage.relocate(self.storage, name), names
+                )))
+                posts = [
+                    Post(pk=pk, image=relocated[name])
+                    for pk, name in batch if relocated[name]
+                ]
+                with transaction.atomic():
+                    Post.objects.bulk_update(posts, ['image'])
+                    if not options['keep_old']:
+                        transaction.on_commit(lambda: self.delete_unused(
+                            [name for name in names if relocated[name]]
+                        ))
+                moved += len(posts)
+                missing += len(batch) - len(posts)
+                self.stdout.write(
+                    f'до поста {last_pk}: перенесено {moved}, '
+                    f'нет файла {missing}'
+                )
+        if moved:
+            bump_all_pages()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перенесено {moved}, без файла {missing}. '
+            'Миниатюры для новых путей создаст warm_thumbnails'
+        ))
+
+    def delete_unused(self, names):
+        """Удаляет старые файлы, на которые больше не ссылается ни один пост.
+
+        Одну картинку могут использовать посты из следующих пачек:
+        её файл удалится после переноса последнего из них.
+        """
+        used = set(Post.objects.filter(image__in=names).values_list(
+            'image', flat=True
+        ))
+        for name in names:
+            if name not in used:
+                delete_thumbnails(name, delete_file=False)
+                self.storage.delete(name)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписок и комментариев'
+
+    def handle(self, *args, **options):
+        repaired = stats.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены, исправлено записей: {repaired}'
+        ))
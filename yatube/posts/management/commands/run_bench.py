@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bench
+
+
+class Command(BaseCommand):
+    help = 'Замеряет p50/p95 и число запросов для страниц posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Запросов к каждой странице',
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            metavar='NAME',
+            help='Замерить только эти страницы (index, profile, ...)',
+        )
+        parser.add_argument('--output', help='Сохранить результат в JSON')
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого замера для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('Нужен хотя бы один запрос к странице')
+        results = bench.run(
+            options['repeat'], cold=options['cold'], names=options['only']
+        )
+        data = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(data)
+        else:
+            self.stdout.write(data)
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as old:
+                    previous = json.load(old)
+            except FileNotFoundError:
+                raise CommandError(f'Файл не найден: {options["compare"]}')
+            for line in bench.compare(previous, results):
+                self.stdout.write(line)
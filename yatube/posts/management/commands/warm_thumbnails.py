@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+PROGRESS_STEP = 100
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок всех постов пулом процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов, по умолчанию по числу ядер',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать уже существующие миниатюры',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('Нужен хотя бы один процесс')
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        total = len(names)
+        forces = [options['force']] * total
+        failed = 0
+        with ExitStack() as stack:
+            if options['workers'] > 1:
+                # Дочерние процессы не должны наследовать соединения
+                connections.close_all()
+                pool = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=options['workers'])
+                )
+                results = pool.map(
+                    thumbnails.generate, names, forces,
+                    chunksize=max(total // (options['workers'] * 4), 1),
+                )
+            else:
+                results = map(thumbnails.generate, names, forces)
+            for done, ok in enumerate(results, 1):
+                failed += not ok
+                if done % PROGRESS_STEP == 0 or done == total:
+                    self.stdout.write(
+                        f'{done}/{total} ({done / total:.0%}), '
+                        f'ошибок {failed}'
+                    )
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Миниатюры готовы: {total - failed} из {total}'
+        ))
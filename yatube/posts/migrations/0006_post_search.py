@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# SQL записан прямо здесь: миграция не должна зависеть от того,
+# как потом поменяется модуль posts.search
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5(body)'
+)
+# Стеммер есть только в Python, поэтому индекс заполняется исходным
+# текстом. Основа слова — его начало, а FTS5 сам приводит регистр,
+# так что поиск по префиксам основ находит и такие строки; точные
+# основы запишет команда rebuild_search_index
+FILL_TABLE = (
+    'INSERT INTO posts_post_fts (rowid, body) SELECT id, text FROM posts_post'
+)
+DROP_TABLE = 'DROP TABLE IF EXISTS posts_post_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    schema_editor.execute(FILL_TABLE)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(DROP_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,211 @@
+"""Полнотекстовый поиск по постам на FTS5.
+
+Текст поста хранится в виртуальной таблице `posts_post_fts`
+уже разобранным на основы слов (стеммер Портера для русского языка
+из Snowball), rowid строки совпадает с id поста. Запрос проходит
+через тот же стеммер, поэтому «котами» находит «кот» и «коты».
+Таблицу держат в актуальном состоянии сигналы `posts.signals`,
+пересобрать её целиком можно командой `rebuild_search_index`.
+
+FTS5 есть только в SQLite: на других базах поиск сводится
+к `icontains` по тексту.
+"""
+import re
+from itertools import islice
+
+from django.db import connection, connections, router, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+BATCH_SIZE = 500
+
+WORD_RE = re.compile(r'\w+')
+
+# Окончания из описания русского стеммера Snowball. Группы,
+# которые отбрасываются только после «а» или «я», записаны
+# через просмотр назад; регулярные выражения применяются
+# к области RV, поэтому «а»/«я» тоже должны лежать в ней
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием'
+    r'|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова; остальные слова только в нижнем регистре."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = re.sub('ость?$', '', rv, 1)
+    stripped = re.sub('ь$', '', rv, 1)
+    if stripped == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = stripped
+    return start + rv
+
+
+def normalize(text):
+    """Текст в том виде, в котором он лежит в индексе."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def match_expression(query):
+    """Выражение MATCH: все основы из запроса, каждая как префикс."""
+    return ' '.join(f'"{word}"*' for word in normalize(query).split())
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_table(cursor):
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(body)'
+    )
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [post.pk, normalize(post.text)],
+        )
+
+
+def index_posts(post_ids):
+    """Переиндексирует посты с данными id одной пачкой запросов."""
+    post_ids = list(post_ids)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [(pk,) for pk in post_ids],
+        )
+        posts = Post.objects.filter(pk__in=post_ids).values_list('pk', 'text')
+        return fill(cursor, posts.iterator())
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def fill(cursor, posts):
+    """Записывает в индекс пары (id, текст) пачками."""
+    posts = iter(posts)
+    count = 0
+    while True:
+        batch = list(islice(posts, BATCH_SIZE))
+        if not batch:
+            return count
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [(pk, normalize(text)) for pk, text in batch],
+        )
+        count += len(batch)
+
+
+def rebuild():
+    """Пересобирает индекс по всем постам, возвращает их число."""
+    # Одна транзакция: в режиме autocommit SQLite фиксировал бы
+    # на диск каждую вставленную строку
+    with transaction.atomic(), connection.cursor() as cursor:
+        create_table(cursor)
+        cursor.execute(f'DELETE FROM {TABLE}')
+        return fill(
+            cursor, Post.objects.values_list('pk', 'text').iterator()
+        )
+
+
+def matching_ids(query):
+    """Подзапрос id подходящих постов для `filter(pk__in=...)`."""
+    return RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности (bm25).
+
+    Поддерживает `count()` и срезы, поэтому подходит для `Paginator`:
+    база отдаёт только id нужной страницы, посты для неё загружаются
+    одним запросом ленты.
+    """
+
+    def __init__(self, query):
+        self.match = match_expression(query)
+        # Индекс читается с той же базы, что и посты (реплики)
+        self.db = router.db_for_read(Post)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        start = index.start or 0
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                [self.match, index.stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.using(self.db).feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    """Посты по запросу в порядке релевантности."""
+    if not is_available():
+        return Post.objects.feed().filter(text__icontains=query)
+    return SearchResults(query)
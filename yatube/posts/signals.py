@@ -0,0 +1,226 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, stats, timeline
+from .cache import (bump_feed_generation, bump_object_versions,
+                    forget_page_scopes)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+# Поля пользователя, которые выводятся на страницах
+DISPLAYED_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    # Пост могли перенести в другую группу: страница прежней тоже
+    # устаревает
+    instance.previous_group_id = None
+    if instance.pk is not None and not raw:
+        instance.previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    bump_feed_generation()
+    forget_page_scopes('post', instance.pk)
+    bump_object_versions([
+        ('post', instance.pk),
+        ('author', instance.author_id),
+        ('group', instance.group_id),
+        ('group', getattr(instance, 'previous_group_id', None)),
+    ])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # Число комментариев есть в карточках всех лент с этим постом
+    bump_feed_generation()
+    scopes = [('post', instance.post_id)]
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        scopes += [('author', post[0]), ('group', post[1])]
+    bump_object_versions(scopes)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    # Подписки видны только в счётчиках профилей
+    bump_object_versions([
+        ('author', instance.user_id),
+        ('author', instance.author_id),
+    ])
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы
+    instance.author_ids = list(_group_authors(instance))
+
+
+def _group_authors(group):
+    return Post.objects.filter(group=group).order_by().values_list(
+        'author_id', flat=True
+    ).distinct()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, created=False, **kwargs):
+    forget_page_scopes('group', instance.slug)
+    scopes = [('group', instance.pk)]
+    if not created:
+        # Название группы есть в карточках её постов во всех лентах
+        bump_feed_generation()
+        author_ids = getattr(instance, 'author_ids', None)
+        if author_ids is None:
+            author_ids = _group_authors(instance)
+        scopes += [('author', author_id) for author_id in author_ids]
+    bump_object_versions(scopes)
+
+
+@receiver(pre_save, sender=User)
+def remember_displayed_name(sender, instance, update_fields=None,
+                            raw=False, **kwargs):
+    instance.previous_displayed = None
+    if instance.pk is None or raw:
+        return
+    # Вход пользователя сохраняет только last_login
+    if update_fields is not None and not (
+        set(update_fields) & set(DISPLAYED_FIELDS)
+    ):
+        return
+    instance.previous_displayed = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*DISPLAYED_FIELDS).first()
+
+
+def is_renamed(user):
+    """Изменилось ли при сохранении то, что видно на страницах."""
+    previous = getattr(user, 'previous_displayed', None)
+    return previous is not None and previous != tuple(
+        getattr(user, field) for field in DISPLAYED_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, raw=False, **kwargs):
+    # Регистрация и смена пароля страниц не меняют
+    forget_page_scopes('profile', instance.username)
+    if created or raw or not is_renamed(instance):
+        return
+    forget_page_scopes('profile', instance.previous_displayed[0])
+    bump_feed_generation()
+    groups = instance.posts.exclude(group=None).order_by().values_list(
+        'group_id', flat=True
+    ).distinct()
+    commented = Comment.objects.filter(author=instance).order_by(
+    ).values_list('post_id', flat=True).distinct()
+    bump_object_versions(
+        [('author', instance.pk)]
+        + [('group', group_id) for group_id in groups]
+        + [('post', post_id) for post_id in commented]
+    )
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_author_pages(sender, instance, **kwargs):
+    forget_page_scopes('profile', instance.username)
+    bump_object_versions([('author', instance.pk)])
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, posts_count=1)
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    if search.is_available():
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    if search.is_available():
+        search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.user_id, following_count=1)
+        stats.bump(instance.author_id, followers_count=1)
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    stats.bump(instance.user_id, following_count=-1)
+    stats.bump(instance.author_id, followers_count=-1)
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.bump(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_commented_post(sender, instance, **kwargs):
+    # Число комментариев есть в карточке поста: валидаторы условных
+    # GET видят его через Post.updated
+    if instance.post_id is not None:
+        Post.objects.filter(pk=instance.post_id).update(
+            updated=timezone.now()
+        )
+
+
+@receiver(post_save, sender=User)
+def touch_renamed_author_posts(sender, instance, created, raw=False,
+                               **kwargs):
+    if not created and not raw and is_renamed(instance):
+        now = timezone.now()
+        instance.posts.update(updated=now)
+        # Имена комментаторов выводятся на странице поста
+        Post.objects.filter(pk__in=Comment.objects.filter(
+            author=instance
+        ).values('post_id')).update(updated=now)
+
+
+@receiver(post_save, sender=Group)
+def touch_group_posts(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.posts.update(updated=timezone.now())
@@ -0,0 +1,95 @@
+"""Денормализованные счётчики пользователя.
+
+Число постов, подписчиков, подписок и комментариев хранится в
+`UserStats` и меняется одним атомарным `UPDATE ... SET x = x + 1`
+при создании и удалении `Post`, `Follow` и `Comment`, поэтому
+страницы профиля и поста не считают `COUNT(*)` на каждом показе.
+Расхождения (например, после `bulk_create`) исправляет `reconcile()`.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from core.db_router import primary
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+COUNTERS = (
+    ('posts_count', Post, 'author'),
+    ('followers_count', Follow, 'author'),
+    ('following_count', Follow, 'user'),
+    ('comments_count', Comment, 'author'),
+)
+BATCH_SIZE = 500
+
+
+def bump(user_id, **deltas):
+    """Атомарно меняет счётчики пользователя на заданные величины."""
+    UserStats.objects.filter(pk=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def for_user(user):
+    """Счётчики пользователя; отсутствующая запись создаётся."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        # Только что созданной записи на реплике ещё может не быть
+        with primary():
+            reconcile(User.objects.filter(pk=user.pk))
+            return UserStats.objects.get(pk=user.pk)
+
+
+def _actual(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def _repair(rows):
+    stored = UserStats.objects.in_bulk([row['pk'] for row in rows])
+    fields = [name for name, _, _ in COUNTERS]
+    changed, created = [], []
+    for row in rows:
+        stats = stored.get(row['pk'])
+        if stats is None:
+            created.append(UserStats(
+                user_id=row['pk'],
+                **{name: row[name] for name in fields}
+            ))
+            continue
+        if any(getattr(stats, name) != row[name] for name in fields):
+            for name in fields:
+                setattr(stats, name, row[name])
+            changed.append(stats)
+    UserStats.objects.bulk_create(created)
+    UserStats.objects.bulk_update(changed, fields)
+    return len(created) + len(changed)
+
+
+def reconcile(users=None):
+    """Пересчитывает счётчики; возвращает число исправленных записей."""
+    users = User.objects.all() if users is None else users
+    # Сверять с отстающей репликой — значит «исправлять» верные счётчики
+    with primary():
+        rows = users.order_by().annotate(**{
+            name: _actual(model, field) for name, model, field in COUNTERS
+        }).values('pk', *(name for name, _, _ in COUNTERS))
+        repaired = 0
+        batch = []
+        for row in rows.iterator():
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                repaired += _repair(batch)
+                batch = []
+        if batch:
+            repaired += _repair(batch)
+    return repaired
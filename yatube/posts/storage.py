@@ -0,0 +1,83 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 своего содержимого и
+раскладывается по двум уровням подкаталогов из первых символов
+хэша: `posts/ab/cd/abcd….jpg`. В одном каталоге оказывается
+не больше нескольких тысяч файлов даже при миллионах картинок,
+а одинаковые загрузки занимают место один раз: если файл с таким
+хэшем уже есть, возвращается его имя.
+
+Поэтому один файл могут использовать несколько постов, и удалять
+его вместе с постом нельзя. Старые картинки из плоского `posts/`
+переносит команда `migrate_media_layout`.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARDED_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_name(directory, digest, extension):
+    return os.path.join(
+        directory, digest[:2], digest[2:4], digest + extension.lower()
+    )
+
+
+def is_sharded(name):
+    return bool(SHARDED_RE.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Кладёт файл в каталог из `upload_to` под именем из его хэша."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1]
+        name = sharded_name(directory, file_digest(content), extension)
+        if self.exists(name):
+            return name
+        try:
+            return super().save(name, content, max_length)
+        except FileExistsError:
+            # Тот же файл одновременно сохранил другой поток или процесс
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # Вместо суффикса к занятому имени: там уже лежит то же содержимое
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+
+def relocate(storage, name):
+    """Переносит файл в раскладку по хэшу; новое имя или None.
+
+    Старый файл не удаляется: это делают после того, как новые
+    имена записаны в базу.
+    """
+    if is_sharded(name):
+        return name
+    if not storage.exists(name):
+        return None
+    with storage.open(name) as content:
+        return storage.save(name, content)
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.filter
+def post_cards(posts):
+    """`{% for card in page_obj|post_cards %}` — карточки из кэша."""
+    return [mark_safe(card) for card in render_cards(posts)]
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Max, Min
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class BenchTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_seed_and_run(self):
+        call_command(
+            'seed_bench', '--users', '30', '--groups', '3', '--posts', '200',
+            '--comments', '300', '--follows', '5', '--seed', '1',
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        # Даты из набора, а не время вставки
+        for model, field in ((Post, 'pub_date'), (Comment, 'created')):
+            with self.subTest(field=field):
+                dates = model.objects.aggregate(
+                    first=Min(field), last=Max(field)
+                )
+                self.assertGreater(
+                    dates['last'] - dates['first'], timedelta(days=30)
+                )
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            200,
+        )
+
+        path = os.path.join(self.directory, 'bench.json')
+        call_command('run_bench', '--repeat', '3', '--output', path)
+        with open(path, encoding='utf-8') as result:
+            results = json.load(result)
+        self.assertEqual(set(results), {
+            'index', 'index_deep', 'index_last', 'group', 'profile',
+            'post_detail', 'follow',
+        })
+        for name, metrics in results.items():
+            with self.subTest(page=name):
+                self.assertEqual(metrics['status'], 200)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p95_ms'])
+                # Повторные запросы берут страницу из памяти процесса
+                self.assertGreater(metrics['cache']['local_hits'], 0)
+
+        out = StringIO()
+        call_command(
+            'run_bench', '--repeat', '1', '--only', 'index',
+            '--compare', path, stdout=out,
+        )
+        self.assertIn('index: p50', out.getvalue())
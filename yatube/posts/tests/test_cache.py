@@ -0,0 +1,28 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+
+from ..cache import bump_feed_generation, feed_generation
+
+
+class FeedGenerationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_generation_again_after_commit(self):
+        before = feed_generation()
+        with mock.patch.object(transaction, 'on_commit') as on_commit:
+            bump_feed_generation()
+        bumped = feed_generation()
+        self.assertNotEqual(bumped, before)
+        # Тест идёт внутри транзакции: второй раз поколение
+        # меняется в колбэке после фиксации
+        on_commit.call_args[0][0]()
+        self.assertNotIn(feed_generation(), (before, bumped))
+
+    def test_generation_recreated_after_eviction(self):
+        before = feed_generation()
+        cache.delete('posts:feed-generation')
+        self.assertNotEqual(feed_generation(), before)
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import cards
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост № {i}', group=cls.group
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def feed(self):
+        return list(Post.objects.feed())
+
+    def test_cards_shared_between_feeds(self):
+        self.guest_client.get(reverse('posts:index'))
+        with mock.patch.object(
+            cards, 'render_to_string', wraps=cards.render_to_string
+        ) as render:
+            response = self.guest_client.get(
+                reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+            )
+        render.assert_not_called()
+        self.assertContains(response, 'Пост № 2')
+
+    def test_page_is_one_multi_get(self):
+        cards.render_cards(self.feed())
+        with mock.patch.object(
+            cards.cache, 'get_many', wraps=cards.cache.get_many
+        ) as get_many, mock.patch.object(
+            cards.cache, 'set_many', wraps=cards.cache.set_many
+        ) as set_many:
+            html = cards.render_cards(self.feed())
+        self.assertEqual(get_many.call_count, 1)
+        set_many.assert_not_called()
+        self.assertEqual(len(html), 3)
+
+    def test_key_follows_card_content(self):
+        post = self.posts[0]
+        before = {p.pk: cards.card_key(p) for p in self.feed()}
+        Comment.objects.create(post=post, author=self.user, text='Ком')
+        self.user.first_name = 'Иван'
+        self.user.save()
+        after = {p.pk: cards.card_key(p) for p in self.feed()}
+        for pk in before:
+            with self.subTest(post=pk):
+                self.assertNotEqual(before[pk], after[pk])
+        html = cards.render_cards(
+            p for p in self.feed() if p.pk == post.pk
+        )[0]
+        self.assertIn('Иван', html)
+        self.assertIn('Комментариев: 1', html)
+
+    def test_card_without_thumbnails_not_cached(self):
+        pk = Post.objects.create(
+            author=self.user, text='С картинкой', image='posts/missing.gif'
+        ).pk
+        post = next(p for p in self.feed() if p.pk == pk)
+        # Миниатюры ещё не готовы или не получились
+        html = cards.render_cards([post])[0]
+        self.assertEqual(post.image_variants, {})
+        self.assertIn('С картинкой', html)
+        self.assertIsNone(cache.get(cards.card_key(post)))
+        post = next(p for p in self.feed() if p.pk == pk)
+        ready = mock.patch.object(
+            cards.thumbnails, 'variants', return_value={'jpeg': 'thumb'}
+        )
+        with mock.patch.object(cards.thumbnails, 'prefetch'), ready:
+            cards.render_cards([post])
+        self.assertIsNotNone(cache.get(cards.card_key(post)))
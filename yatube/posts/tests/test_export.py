@@ -0,0 +1,108 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост № {i}', group=cls.group
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def stream(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_profile_jsonl_with_comments(self):
+        response = self.client.get(
+            reverse('posts:profile_export', kwargs={'username': 'author'}),
+            {'comments': 1},
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="author.jsonl"',
+        )
+        records = [
+            json.loads(line) for line in self.stream(response).splitlines()
+        ]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertEqual(records[0]['comments'][0]['author'], 'other')
+        self.assertEqual(records[1]['comments'], [])
+
+    def test_group_csv(self):
+        response = self.client.get(
+            reverse('posts:group_export', kwargs={'slug': 'test-slug'}),
+            {'format': 'csv', 'comments': 1},
+        )
+        rows = list(csv.DictReader(StringIO(self.stream(response))))
+        self.assertEqual(
+            [row['type'] for row in rows],
+            ['post', 'comment', 'post', 'post'],
+        )
+        self.assertEqual(rows[1]['post'], str(self.posts[0].pk))
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            reverse('posts:profile_export', kwargs={'username': 'author'}),
+            {'format': 'xml'},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_output_reimports(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'author.csv')
+        call_command(
+            'export_posts', '--author', 'author', '--format', 'csv',
+            '--comments', '--output', path,
+        )
+        Comment.objects.all().delete()
+        Post.objects.filter(author=self.author).delete()
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.filter(author=self.author).order_by(
+                'pk'
+            ).values_list('pk', 'text')),
+            [(post.pk, post.text) for post in self.posts],
+        )
+        self.assertEqual(Comment.objects.get().post_id, self.posts[0].pk)
+
+    def test_command_to_stdout(self):
+        out = StringIO()
+        call_command('export_posts', '--group', 'test-slug', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -13,11 +14,20 @@ from ..models import Post, Group, Comment
 from ..forms import PostForm
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
 
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostCreateFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -53,17 +63,9 @@ class PostCreateFormTest(TestCase):
 
     def test_create_post(self):
         post_count = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         form_data = {
@@ -82,17 +84,16 @@ class PostCreateFormTest(TestCase):
             kwargs={'username': self.user}
         ))
         last_post = Post.objects.order_by('pub_date').last()
+        # Картинка хранится под хэшем содержимого
+        image_name = f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif'
         self.assertTrue(
             Post.objects.filter(
                 group=self.group.pk,
                 text=self.post.text,
-                image='posts/small.gif',
+                image=image_name,
             ).exists()
         )
-        self.assertEqual(
-            last_post.image.name,
-            'posts/' + form_data['image'].name
-        )
+        self.assertEqual(last_post.image.name, image_name)
         self.assertEqual(last_post.text, form_data['text'])
         self.assertEqual(last_post.group.id, form_data['group'])
         self.assertEqual(Post.objects.count(), post_count + 1)
@@ -0,0 +1,80 @@
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from .. import images
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Поворот на 90° по часовой стрелке
+ROTATE_90_CW = 6
+ORIENTATION = 0x0112
+CAMERA_MAKE = 0x010F
+
+
+def make_jpeg(size, orientation=None):
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[CAMERA_MAKE] = 'Phone'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile('photo.jpg', output.getvalue(), 'image/jpeg')
+
+
+@override_settings(POST_IMAGE_MAX_SIZE=(100, 100), POST_IMAGE_QUALITY=80)
+class NormalizeTest(SimpleTestCase):
+    def open(self, upload):
+        upload.seek(0)
+        return Image.open(upload)
+
+    def test_downscaled_and_oriented(self):
+        image = self.open(images.normalize(
+            make_jpeg((400, 200), orientation=ROTATE_90_CW)
+        ))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (50, 100))
+        self.assertTrue(image.info.get('progressive'))
+
+    @override_settings(POST_IMAGE_MAX_SIZE=(200, 100))
+    def test_rotated_fits_max_size(self):
+        image = self.open(images.normalize(
+            make_jpeg((400, 200), orientation=ROTATE_90_CW)
+        ))
+        self.assertEqual(image.size, (50, 100))
+
+    def test_downscaled_before_transpose(self):
+        with mock.patch.object(
+            images.ImageOps, 'exif_transpose',
+            wraps=images.ImageOps.exif_transpose,
+        ) as transpose:
+            images.normalize(make_jpeg((1600, 800), orientation=ROTATE_90_CW))
+        self.assertEqual(transpose.call_args[0][0].size, (100, 50))
+
+    def test_metadata_stripped(self):
+        image = self.open(images.normalize(make_jpeg((50, 50))))
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_png_keeps_transparency(self):
+        output = BytesIO()
+        Image.new('RGBA', (300, 300), (0, 0, 0, 0)).save(output, 'PNG')
+        upload = SimpleUploadedFile('logo.png', output.getvalue())
+        image = self.open(images.normalize(upload))
+        self.assertEqual((image.format, image.mode), ('PNG', 'RGBA'))
+        self.assertEqual(image.size, (100, 100))
+
+    def test_gif_untouched(self):
+        upload = SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        self.assertIs(images.normalize(upload), upload)
+        self.assertEqual(upload.read(), SMALL_GIF)
@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import export, importer, search, timeline
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write('\n'.join(lines) + '\n')
+        return path
+
+    def import_posts(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_jsonl(self):
+        records = [
+            {'type': 'group', 'slug': 'cats', 'title': 'Коты'},
+            {'id': 100, 'author': 'author', 'text': 'Кот спит',
+             'group': 'cats', 'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'author': 'newbie', 'text': 'Первый пост'},
+            {'type': 'comment', 'post': 100, 'author': 'reader',
+             'text': 'Отличный кот'},
+            {'author': 'author', 'text': 'Пост', 'group': 'dogs'},
+            {'type': 'comment', 'post': 999, 'author': 'reader',
+             'text': 'Нет такого поста'},
+        ]
+        lines = [json.dumps(record) for record in records] + ['{не json']
+        path = self.write('posts.jsonl', lines)
+        with mock.patch.object(search, 'rebuild') as rebuild, \
+                mock.patch.object(timeline, 'rebuild') as rebuild_timelines:
+            out, err = self.import_posts(path, '--create-users')
+        # Индекс и ленты обновляются только для новых постов
+        rebuild.assert_not_called()
+        rebuild_timelines.assert_not_called()
+        self.assertIn('постов 2, комментариев 1', out)
+        self.assertIn('пропущено 3', out)
+        self.assertIn('запись 5: нет группы dogs', err)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(
+            post.pub_date, datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+        self.assertTrue(Post.objects.filter(author__username='newbie'))
+        self.assertEqual(Comment.objects.get().post, post)
+        # Производные данные обновлены, хотя сигналов не было
+        self.assertEqual(
+            UserStats.objects.get(pk=self.author.pk).posts_count, 1
+        )
+        self.assertEqual(
+            [entry.post_id for entry in timeline.follow_feed(self.reader)],
+            [100],
+        )
+        if search.is_available():
+            self.assertEqual(
+                [p.pk for p in search.search('коты')[:10]], [100]
+            )
+
+    def test_counts_only_new_rows(self):
+        path = self.write('posts.jsonl', [
+            json.dumps({'type': 'group', 'slug': 'cats', 'title': 'Коты'}),
+            json.dumps({'id': 100, 'author': 'author', 'text': 'Кот'}),
+            json.dumps({'type': 'comment', 'id': 7, 'post': 100,
+                        'author': 'reader', 'text': 'Отличный кот'}),
+        ])
+        self.import_posts(path)
+        out, _ = self.import_posts(path)
+        self.assertIn('групп 0, постов 0, комментариев 0', out)
+        self.assertIn('уже были в базе 3', out)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_error_messages_capped(self):
+        path = self.write('posts.jsonl', ['{не json'] * 30)
+        out, err = self.import_posts(path)
+        self.assertIn('пропущено 30', out)
+        self.assertEqual(err.count('некорректный JSON'), importer.MAX_ERRORS)
+        self.assertIn(f'и ещё пропущено: {30 - importer.MAX_ERRORS}', err)
+
+    def test_jsonl_export_round_trip(self):
+        post = Post.objects.create(author=self.author, text='Кот')
+        Comment.objects.create(post=post, author=self.reader, text='Ура')
+        lines = list(export.lines(Post.objects.all(), 'jsonl', True))
+        Comment.objects.all().delete()
+        Post.objects.all().delete()
+        path = self.write('posts.jsonl', [line.rstrip() for line in lines])
+        out, _ = self.import_posts(path)
+        self.assertIn('постов 1, комментариев 1', out)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post_id, post.pk)
+        self.assertEqual(comment.text, 'Ура')
+
+    def test_resumes_from_checkpoint(self):
+        path = self.write('posts.jsonl', [
+            json.dumps({'author': 'author', 'text': f'Пост № {i}'})
+            for i in range(5)
+        ])
+        self.import_posts(path, '--batch-size', '2', '--skip-derived')
+        with open(f'{path}.checkpoint', encoding='utf-8') as checkpoint:
+            self.assertEqual(json.load(checkpoint), {'position': 5})
+        Post.objects.filter(text__in=['Пост № 3', 'Пост № 4']).delete()
+        with open(f'{path}.checkpoint', 'w', encoding='utf-8') as checkpoint:
+            json.dump({'position': 3}, checkpoint)
+        self.import_posts(path, '--resume', '--skip-derived')
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост № {i}' for i in range(5)],
+        )
+
+    def test_imports_csv(self):
+        Group.objects.create(slug='cats', title='Коты', description='')
+        path = self.write('posts.csv', [
+            'type,author,text,group,pub_date',
+            'post,author,Кот из CSV,cats,',
+            'post,author,Без группы,,2021-05-06 07:08:09',
+        ])
+        out, _ = self.import_posts(path, '--skip-derived')
+        self.assertIn('постов 2', out)
+        self.assertEqual(
+            Post.objects.get(text='Кот из CSV').group.slug, 'cats'
+        )
+
+    def test_reimports_csv(self):
+        path = self.write('posts.csv', [
+            'type,id,post,author,text',
+            'post,100,,author,Привет',
+            'comment,7,100,reader,Ответ',
+            'post,abc,,author,Плохой id',
+            'comment,,xyz,reader,Плохой пост',
+        ])
+        out, err = self.import_posts(path)
+        self.assertIn('постов 1, комментариев 1', out)
+        self.assertIn('запись 3: некорректный id: abc', err)
+        self.assertIn('запись 4: некорректный post: xyz', err)
+        with mock.patch.object(search, 'index_posts') as index_posts, \
+                mock.patch.object(timeline, 'fan_out_posts') as fan_out:
+            out, _ = self.import_posts(path)
+        self.assertIn('постов 0, комментариев 0', out)
+        self.assertIn('уже были в базе 2', out)
+        index_posts.assert_not_called()
+        fan_out.assert_not_called()
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_unknown_format(self):
+        path = self.write('posts.xml', ['<posts/>'])
+        with self.assertRaises(CommandError):
+            self.import_posts(path)
@@ -0,0 +1,56 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import TestCase
+
+from core.paginator import CursorPaginator
+from .. import timeline
+from ..models import Comment, Follow, Group, Post
+from ..views import FEED_KEYS
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса в формате SQLite')
+class FeedIndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertRegex(plan, r'(SCAN|SEARCH) \S+ USING (COVERING )?INDEX')
+
+    def test_feed_queries_use_indexes(self):
+        paginator = CursorPaginator(Post.objects.feed(), 10, FEED_KEYS)
+        seek = paginator._seek([self.post.pub_date, self.post.pk])
+        querysets = {
+            'index': Post.objects.feed(),
+            'index_cursor': Post.objects.feed().filter(seek),
+            'group_list': self.group.posts.feed(),
+            'profile': self.user.posts.feed(),
+            'post_detail': Comment.objects.filter(post_id=self.post.pk),
+            'follow_index': timeline.follow_feed(self.user),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(view=name):
+                self.assertUsesIndex(queryset[:10])
+
+    def test_follow_is_unique(self):
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=author)
@@ -0,0 +1,73 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from .. import loadtest
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class LoadTestTest(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=author, text='Тестовый пост', group=group)
+
+    def test_wsgi_client_keeps_session(self):
+        from yatube.wsgi import application
+
+        user = loadtest.VirtualUser(
+            application, 'load0', loadtest.prepare(1), random.Random(1)
+        )
+        self.assertEqual(user.login(), 302)
+        self.assertIn('sessionid', user.client.cookies)
+        self.assertEqual(user.follow_feed(), 200)
+        self.assertEqual(user.post(), 302)
+        self.assertTrue(Post.objects.filter(author__username='load0'))
+
+    def test_summary(self):
+        sample = loadtest.prepare(2)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            summary = loadtest.run(
+                executor, 1, sample['usernames'], sample, 0.5, seed=1
+            )
+        self.assertGreater(summary['requests'], 2)
+        self.assertEqual(summary['error_rate'], 0)
+        self.assertEqual(
+            sum(count for _, count in summary['histogram']),
+            summary['requests'],
+        )
+        self.assertEqual(summary['scenarios']['login']['requests'], 2)
+
+    def test_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'load.json')
+        out = StringIO()
+        call_command(
+            'load_test', '--workers', '1', '--users', '1',
+            '--duration', '0.2', '--output', path, stdout=out,
+        )
+        self.assertIn('запросов/с', out.getvalue())
+        with open(path, encoding='utf-8') as result:
+            self.assertIn('sqlite_lock_errors', json.load(result))
+
+        out = StringIO()
+        call_command(
+            'load_test', '--workers', '1', '--users', '1',
+            '--duration', '0.2', '--compare', path, stdout=out,
+        )
+        self.assertIn('throughput_rps: ', out.getvalue())
@@ -0,0 +1,108 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class StemTest(TestCase):
+    def test_russian_words(self):
+        words = {
+            'котами': 'кот',
+            'коты': 'кот',
+            'проблемы': 'проблем',
+            'красивейшая': 'красив',
+            'Ёжики': 'ежик',
+            'Python': 'python',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(search.stem(word), expected)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс FTS5 есть только в SQLite')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', password='pass', is_staff=True,
+            is_superuser=True,
+        )
+        cls.cats = Post.objects.create(
+            author=cls.user,
+            text='Коты и кошки. Про котов, котами и о котах',
+        )
+        cls.cat = Post.objects.create(
+            author=cls.user,
+            text='Мой кот спит',
+        )
+        cls.dog = Post.objects.create(
+            author=cls.user,
+            text='Собака гуляет',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def ids(self, query):
+        return [post.pk for post in search.search(query)[:10]]
+
+    def test_finds_word_forms_ranked(self):
+        self.assertEqual(self.ids('коту'), [self.cats.pk, self.cat.pk])
+        self.assertEqual(search.search('коту').count(), 2)
+        self.assertEqual(self.ids('собаками'), [self.dog.pk])
+        self.assertEqual(self.ids('!!!'), [])
+
+    def test_index_follows_posts(self):
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Кот гуляет'
+        dog.save()
+        self.assertIn(dog.pk, self.ids('кот'))
+        self.assertEqual(self.ids('собака'), [])
+        Post.objects.get(pk=self.cat.pk).delete()
+        self.assertNotIn(self.cat.pk, self.ids('кот'))
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(self.ids('кот'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('постов: 3', out.getvalue())
+        self.assertEqual(self.ids('кот'), [self.cats.pk, self.cat.pk])
+
+    def test_search_page(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кот № {i}') for i in range(12)
+        )
+        search.rebuild()
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 14)
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кот', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+    def test_admin_search(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.dog.pk],
+        )
@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.get_stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.user).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+        self.assertEqual(self.get_stats(self.user).following_count, 0)
+
+    def test_comment_counter(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.assertEqual(self.get_stats(self.user).comments_count, 1)
+        comment.delete()
+        self.assertEqual(self.get_stats(self.user).comments_count, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        UserStats.objects.filter(user=self.author).update(
+            posts_count=42, followers_count=7
+        )
+        UserStats.objects.filter(user=self.user).delete()
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        author_stats = self.get_stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertTrue(UserStats.objects.filter(user=self.user).exists())
+        self.assertIn('2', out.getvalue())
+
+    def test_profile_shows_counters(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.author})
+        )
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertEqual(response.context['author_stats'].posts_count, 1)
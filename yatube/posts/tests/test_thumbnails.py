@@ -0,0 +1,210 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails
+from ..forms import PostForm
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def thumbnail(self, name):
+        geometry, options = thumbnails.variant_options()['jpeg']
+        return get_thumbnail(name, geometry, **options)
+
+    def thumbnail_exists(self, name):
+        geometry, options = thumbnails.variant_options()['jpeg']
+        return thumbnails.thumbnail_file(name, geometry, options).exists()
+
+    def test_form_schedules_thumbnails(self):
+        form = PostForm(
+            data={'text': 'Пост с картинкой'},
+            files={'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, 'image/gif'
+            )},
+            instance=Post(author=self.user),
+        )
+        self.assertTrue(form.is_valid())
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = form.save()
+            PostForm(
+                data={'text': 'Новый текст'}, instance=post
+            ).save()
+        schedule.assert_called_once_with(post.image.name)
+
+    def test_generate_variants(self):
+        post = self.create_post()
+        self.assertTrue(thumbnails.generate(post.image.name))
+        self.assertTrue(self.thumbnail(post.image.name).exists())
+
+    def test_variants_exposed_on_post(self):
+        post = self.create_post('exposed.gif', SMALL_GIF + b'\xfe')
+        variants = Post.objects.get(pk=post.pk).image_variants
+        # В запросе миниатюры не создаются
+        self.assertEqual(variants, {})
+        self.assertFalse(self.thumbnail_exists(post.image.name))
+        self.assertTrue(thumbnails.generate(post.image.name))
+        variants = Post.objects.get(pk=post.pk).image_variants
+        self.assertEqual(set(variants), set(thumbnails.formats()))
+        self.assertTrue(variants['jpeg'].url.endswith('.jpg'))
+        if 'webp' in variants:
+            self.assertTrue(variants['webp'].url.endswith('.webp'))
+        self.assertEqual(Post(text='Без картинки').image_variants, {})
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_missing_variants_go_to_pool(self):
+        with mock.patch.object(thumbnails, 'submit') as submit, \
+                mock.patch.object(thumbnails, 'get_thumbnail') as create:
+            self.assertEqual(thumbnails.variants('posts/new.gif'), {})
+        submit.assert_called_once_with('posts/new.gif')
+        create.assert_not_called()
+
+    def test_webp_variant_follows_pillow_support(self):
+        cases = (
+            (True, {'jpeg': 'JPEG', 'webp': 'WEBP'}),
+            (False, {'jpeg': 'JPEG'}),
+        )
+        for webp, expected in cases:
+            with self.subTest(webp=webp), mock.patch.object(
+                thumbnails.features, 'check', return_value=webp
+            ) as check:
+                options = thumbnails.variant_options()
+                check.assert_called_with('webp')
+                self.assertEqual(
+                    {key: opts['format'] for key, (_, opts) in
+                     options.items()},
+                    expected,
+                )
+
+    def test_missing_original(self):
+        failing = mock.patch.object(
+            thumbnails, 'get_thumbnail', side_effect=IOError
+        )
+        with self.assertLogs('posts.thumbnails', 'ERROR'), failing:
+            self.assertFalse(thumbnails.generate('posts/missing.gif'))
+
+    def test_prefetch_page(self):
+        ready = [
+            self.create_post(f'{i}.gif', SMALL_GIF + bytes([i]))
+            for i in range(3)
+        ]
+        for post in ready:
+            self.assertTrue(thumbnails.generate(post.image.name))
+        expected = {
+            post.pk: {
+                key: thumbnail.name
+                for key, thumbnail in thumbnails.variants(
+                    post.image.name
+                ).items()
+            }
+            for post in ready
+        }
+        pending = self.create_post('pending.gif', SMALL_GIF + b'\xff')
+        Post.objects.create(author=self.user, text='Без картинки')
+        cache.clear()
+
+        posts = list(Post.objects.order_by('pk'))
+        # Все миниатюры страницы — одним запросом к базе
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            for post in posts[:3]:
+                variants = {
+                    key: thumbnail.name
+                    for key, thumbnail in post.image_variants.items()
+                }
+                self.assertEqual(variants, expected[post.pk])
+        # Неготовые миниатюры не создаются, картинка без них
+        self.assertEqual(posts[3].__dict__['image_variants'], {})
+        self.assertNotIn('image_variants', posts[4].__dict__)
+
+        # Найденное в базе попало в кэш
+        posts = list(Post.objects.filter(pk__in=expected))
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+        for post in posts:
+            self.assertIn('image_variants', post.__dict__)
+        self.assertEqual(pending.image_variants, {})
+
+    def test_warm_command(self):
+        # Одинаковые картинки хранятся одним файлом, поэтому содержимое
+        # у каждой своё
+        names = [
+            self.create_post(f'{i}.gif', SMALL_GIF + bytes([i])).image.name
+            for i in range(3)
+        ]
+        out = StringIO()
+        call_command('warm_thumbnails', '--workers', '1', stdout=out)
+        self.assertIn('3/3 (100%), ошибок 0', out.getvalue())
+        for name in names:
+            with self.subTest(name=name):
+                self.assertTrue(self.thumbnail(name).exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=1)
+class BackgroundThumbnailsTest(TransactionTestCase):
+    # Поток пула пишет в базу своим соединением: внутри транзакции
+    # TestCase таблица была бы заблокирована
+    def setUp(self):
+        # Ключи sorl в кэше могли остаться от миниатюр прошлых тестов
+        cache.clear()
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate_in_background(self):
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(
+            author=user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('bg.gif', SMALL_GIF, 'image/gif'),
+        )
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit'
+        ) as on_commit:
+            thumbnails.schedule(post.image.name)
+        # Колбэк после фиксации возвращает Future задачи из пула
+        future = on_commit.call_args[0][0]()
+        self.assertTrue(future.result(timeout=30))
+        geometry, options = thumbnails.variant_options()['jpeg']
+        self.assertTrue(
+            get_thumbnail(post.image.name, geometry, **options).exists()
+        )
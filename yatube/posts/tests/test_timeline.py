@@ -0,0 +1,152 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.other_reader = User.objects.create_user(username='OtherReader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def timeline_ids(self, user):
+        return list(
+            TimelineEntry.objects.filter(user=user).values_list(
+                'post_id', flat=True
+            )
+        )
+
+    def test_follow_backfills_timeline(self):
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        self.assertEqual(self.timeline_ids(self.reader), [self.old_post.pk])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            self.timeline_ids(self.reader), [post.pk, self.old_post.pk]
+        )
+        self.assertEqual(self.timeline_ids(self.other_reader), [])
+
+    def test_unfollow_prunes_only_own_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertEqual(self.timeline_ids(self.reader), [])
+        self.assertEqual(
+            self.timeline_ids(self.other_reader), [self.old_post.pk]
+        )
+        self.assertTrue(Follow.objects.filter(
+            user=self.other_reader,
+            author=self.author,
+        ).exists())
+
+    def test_follow_index_reads_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post]
+        )
+
+    @override_settings(FEED_PAGINATION='cursor')
+    def test_follow_index_cursor_pages(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост № {i}') for i in range(10)
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        url = reverse('posts:follow_index')
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual(list(second_page), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_read_at_request_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertNotIn(post.pk, self.timeline_ids(self.reader))
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post]
+        )
+        # Чтение ленты ничего не записывает
+        self.assertEqual(TimelineEntry.objects.count(), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, FEED_PAGINATION='cursor')
+    def test_live_author_cursor_pages(self):
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=other)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        own = Post.objects.create(author=other, text='Пост из ленты')
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост № {i}') for i in range(9)
+        )
+        url = reverse('posts:follow_index')
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertIn(own, list(first_page))
+        self.assertEqual(list(second_page), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_crossing_limit(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline_ids(self.reader), [self.old_post.pk])
+        # Порог пройден вверх: записи автора убраны из лент
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        self.assertEqual(TimelineEntry.objects.count(), 0)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        # Обратно под порог: в ленту попадает и пост, написанный,
+        # пока автор читался при запросе
+        Follow.objects.filter(user=self.other_reader).delete()
+        self.assertEqual(
+            self.timeline_ids(self.reader), [post.pk, self.old_post.pk]
+        )
+        self.assertEqual(self.timeline_ids(self.other_reader), [])
+
+    def test_hydrate_keeps_order(self):
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            timeline.hydrate([self.old_post.pk, post.pk]),
+            [self.old_post, post],
+        )
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timelines', stdout=out)
+        self.assertEqual(self.timeline_ids(self.reader), [self.old_post.pk])
+        self.assertIn('1', out.getvalue())
@@ -7,8 +7,10 @@ from django.urls import reverse
 from django.core.cache import cache
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, Follow
+from ..models import Post, Group, Follow, Comment
 from ..forms import PostForm
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -16,7 +18,7 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostPagesTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -196,7 +198,36 @@ class PostPagesTest(TestCase):
         response = self.authorized_client.get(reverse('posts:index'))
         Post.objects.all().delete()
         response_after_del = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_after_del.content)
+        self.assertNotEqual(response.content, response_after_del.content)
+
+    def test_cache_for_index_page_shows_new_post(self):
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Свежий пост')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_cache_for_index_page_reuses_fragment(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response_cached = self.authorized_client.get(
+                reverse('posts:index')
+            )
+        self.assertEqual(response.content, response_cached.content)
+        self.assertFalse(
+            [query for query in queries if 'posts_post' in query['sql']]
+        )
+
+    def test_cache_for_index_page_is_page_aware(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост № {i}') for i in range(10)
+        )
+        cache.clear()
+        first = self.authorized_client.get(reverse('posts:index'))
+        second = self.authorized_client.get(
+            reverse('posts:index'), {'page': 2}
+        )
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, self.post.text)
 
     def test_profile_follow(self):
         follow_author_before = Follow.objects.all().count()
@@ -312,3 +343,190 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(value=value):
                 response = self.authorized_client.get(value, args)
                 self.assertEqual(len(response.context['page_obj']), 7)
+
+    @override_settings(FEED_PAGINATION='cursor')
+    def test_paginator_cursor_pages(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+        for value in pages:
+            with self.subTest(value=value):
+                first_page = self.authorized_client.get(value).context[
+                    'page_obj'
+                ]
+                self.assertEqual(len(first_page), 10)
+                response = self.authorized_client.get(
+                    value, {'after': first_page.next_cursor}
+                )
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), 7)
+                self.assertFalse(second_page.has_next())
+                self.assertContains(
+                    response, f'?before={second_page.previous_cursor}'
+                )
+
+
+class FeedQueriesTest(TestCase):
+    # Запросы сессии и пользователя у авторизованного клиента входят
+    # в лимит, как и два запроса валидаторов ETag на холодном кэше.
+    # Группе и профилю на холодном кэше нужен ещё id объекта для версии
+    # страницы
+    MAX_QUERIES = (
+        ('posts:index', {}, 2),
+        ('posts:group_list', {'slug': 'test-slug'}, 6),
+        ('posts:profile', {'username': 'TestAuthor'}, 6),
+        ('posts:follow_index', {}, 6),
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.authors = [
+            User.objects.create_user(
+                username=username, first_name='Имя', last_name='Фамилия'
+            )
+            for username in ('TestAuthor', 'OtherAuthor')
+        ]
+        cls.group = Group.objects.create(
+            title='Заголовок тестовой группы',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            for i in range(6):
+                post = Post.objects.create(
+                    author=author,
+                    text=f'Пост № {i}',
+                    group=cls.group,
+                )
+                Comment.objects.create(
+                    post=post, author=cls.user, text='Комментарий'
+                )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_feed_views_query_limits(self):
+        for name, kwargs, limit in self.MAX_QUERIES:
+            client = self.guest_client
+            if name == 'posts:follow_index':
+                client = self.authorized_client
+            with self.subTest(view=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(len(response.context['page_obj']), 0)
+                self.assertLessEqual(
+                    len(queries), limit,
+                    '\n'.join(query['sql'] for query in queries),
+                )
+
+    def test_feed_has_comment_count(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            with self.subTest(post=post.pk):
+                self.assertEqual(post.comment_count, 1)
+
+
+class PublicPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_page_shared_between_users(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и проверка подписки — без постов
+            response = self.reader_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'reader')
+        self.assertContains(response, 'Подписаться')
+
+    def test_holes_rendered_per_user(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        self.author_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertNotContains(response, edit_url)
+        response = self.author_client.get(url)
+        self.assertContains(response, edit_url)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Выйти')
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_follow_invalidates_page(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.reader_client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Отписаться')
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        authors = [
+            User.objects.create_user(username=f'reader{i}') for i in range(5)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=authors[i % 5], text=f'Ком № {i}')
+            for i in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_comments(self):
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_fragment_loads_next_comments(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        first = self.guest_client.get(url).context['comments']
+        with self.assertNumQueries(2):
+            # Пост и одна страница комментариев вместе с авторами
+            response = self.guest_client.get(
+                url, {'after': first.next_cursor}
+            )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Ком № {i}' for i in range(20, 25)],
+        )
+        self.assertNotContains(response, 'Показать ещё')
+        self.assertNotContains(response, '<html')
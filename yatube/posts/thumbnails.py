@@ -0,0 +1,211 @@
+"""Заранее подготовленные миниатюры картинок постов.
+
+Шаблоны получают миниатюры через `Post.image_variants` (sorl-thumbnail),
+но в запросе они только ищутся в хранилище ключей sorl: декодировать
+и уменьшать оригинал — работа фонового пула. `PostForm` после
+сохранения картинки ставит её варианты (`variant_options()`) в пул
+потоков; картинку, для которой при показе чего-то не нашлось, туда же
+ставит `variants()`. Пока пул не закончит, пост показывается без
+картинки. Команда `warm_thumbnails` готовит миниатюры всех постов
+пулом процессов, например после переезда или очистки кэша.
+
+Поиск готовой миниатюры — запрос в кэш (а при промахе — в таблицу
+`thumbnail_kvstore`) на каждый вариант каждой картинки. `prefetch`
+делает его для всей страницы ленты одним `get_many` и не больше чем
+одним запросом к базе.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger('posts.thumbnails')
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+# Картинки в пуле или в его очереди: {имя: Future}
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def formats():
+    """Форматы миниатюр: {ключ в `image_variants`: формат Pillow}.
+
+    Прогрессивный JPEG для всех браузеров и WebP, если Pillow собран
+    с его поддержкой; их отдаёт `Post.image_variants` для <picture>.
+    """
+    result = {'jpeg': 'JPEG'}
+    if features.check('webp'):
+        result['webp'] = 'WEBP'
+    return result
+
+
+def variant_options():
+    """Геометрия и опции sorl для каждого формата из `formats()`."""
+    return {
+        key: (GEOMETRY, dict(OPTIONS, format=fmt, progressive=True))
+        for key, fmt in formats().items()
+    }
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate(name, force=False):
+    """Создаёт все варианты картинки; True, если все они есть."""
+    try:
+        if force:
+            delete(name, delete_file=False)
+        return all(
+            get_thumbnail(name, geometry, **options).exists()
+            for geometry, options in variant_options().values()
+        )
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return False
+
+
+def _generate_in_background(name):
+    try:
+        return generate(name)
+    finally:
+        with _pending_lock:
+            _pending.pop(name, None)
+        # Соединения потока пула (хранилище ключей sorl) не закрываются
+        # сами по концу запроса
+        connections.close_all()
+
+
+def variants(name):
+    """Готовые миниатюры картинки по форматам: {'jpeg': ..., 'webp': ...}.
+
+    Ничего не создаёт: если какой-то миниатюры ещё нет, возвращает {}
+    и ставит картинку в пул.
+    """
+    found = {}
+    for key, (geometry, options) in variant_options().items():
+        thumbnail = default.kvstore.get(
+            thumbnail_file(name, geometry, options)
+        )
+        if thumbnail is None:
+            enqueue(name)
+            return {}
+        found[key] = thumbnail
+    return found
+
+
+def thumbnail_file(name, geometry, options):
+    """Миниатюра, которую вернул бы `get_thumbnail`, без обращения к файлам.
+
+    Повторяет подстановку опций по умолчанию из
+    `ThumbnailBackend.get_thumbnail`, от неё зависит имя миниатюры.
+    """
+    backend = default.backend
+    source = ImageFile(name)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry, options),
+        default.storage,
+    )
+
+
+def prefetch(posts):
+    """Заполняет `image_variants` постов страницы пачкой запросов.
+
+    Посты, у которых каких-то миниатюр ещё нет, получают пустые
+    варианты, а их картинки ставятся в пул.
+    """
+    if not isinstance(default.kvstore, KVStore):
+        return
+    posts = [
+        post for post in posts
+        if post.image and 'image_variants' not in post.__dict__
+    ]
+    specs = variant_options()
+    keys = {
+        post.pk: [
+            add_prefix(thumbnail_file(post.image.name, geometry, options).key)
+            for geometry, options in specs.values()
+        ]
+        for post in posts
+    }
+    wanted = {key for post_keys in keys.values() for key in post_keys}
+    if not wanted:
+        return
+    cache = default.kvstore.cache
+    values = cache.get_many(wanted)
+    missing = wanted - values.keys()
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        if stored:
+            cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(stored)
+    for post in posts:
+        found = [values.get(key, EMPTY_VALUE) for key in keys[post.pk]]
+        if any(value == EMPTY_VALUE for value in found):
+            post.__dict__['image_variants'] = {}
+            enqueue(post.image.name)
+            continue
+        # Кладём значение cached_property, как это сделал бы первый доступ
+        post.__dict__['image_variants'] = dict(
+            zip(specs, map(deserialize_image_file, found))
+        )
+
+
+def schedule(name):
+    """Готовит миниатюры в фоне после фиксации транзакции."""
+    if not settings.THUMBNAIL_WORKERS:
+        # Без пула миниатюры готовятся сразу, в этом же потоке
+        transaction.on_commit(lambda: generate(name))
+        return
+    transaction.on_commit(lambda: submit(name))
+
+
+def submit(name):
+    """Ставит картинку в пул; Future с результатом `generate`.
+
+    Картинка, которая уже ждёт в пуле, второй раз не ставится.
+    """
+    with _pending_lock:
+        future = _pending.get(name)
+        if future is None:
+            future = executor().submit(_generate_in_background, name)
+            _pending[name] = future
+    return future
+
+
+def enqueue(name):
+    """Ставит в пул картинку, миниатюр которой не нашлось при показе."""
+    # Без пула миниатюры готовят форма и `warm_thumbnails`, но не запрос
+    if settings.THUMBNAIL_WORKERS:
+        submit(name)
@@ -0,0 +1,237 @@
+"""Материализованные ленты подписок (fan-out on write).
+
+Новый пост раскладывается по лентам подписчиков автора в момент
+публикации, поэтому страница `/follow/` читает готовый список id
+из `TimelineEntry`, а не соединяет `Follow` и `Post` на каждом запросе.
+Авторы, у которых подписчиков больше `TIMELINE_FANOUT_LIMIT`,
+в ленты не раскладываются: их посты подмешиваются к ленте читателя
+при чтении, без записи. Когда автор переходит порог, его записи
+убираются из лент или, наоборот, раскладываются по лентам всех
+подписчиков, так что записи автора в `TimelineEntry` есть ровно
+тогда, когда он раскладывается.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+TIMELINE_KEYS = ('-pub_date', '-post_id')
+POST_KEYS = ('-pub_date', '-id')
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _entries_for(user_id, posts):
+    return (
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, author_id, pub_date in posts.values_list(
+            'pk', 'author_id', 'pub_date'
+        ).iterator()
+    )
+
+
+def followers_count(author_id):
+    followers = UserStats.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    return followers or 0
+
+
+def is_fanned_out(author_id):
+    """Раскладываются ли посты автора по лентам при публикации."""
+    return followers_count(author_id) <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def live_authors(user_id):
+    """Авторы из подписок читателя, посты которых читаются при запросе."""
+    return Follow.objects.filter(
+        user_id=user_id,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """Раскладывает уже сохранённые посты по лентам подписчиков.
+
+    Для пачек постов, созданных без сигналов (`bulk_create`, импорт):
+    посты и подписки читаются двумя запросами на всю пачку.
+    """
+    by_author = defaultdict(list)
+    rows = posts.filter(
+        Q(author__stats__isnull=True)
+        | Q(author__stats__followers_count__lte=(
+            settings.TIMELINE_FANOUT_LIMIT
+        ))
+    ).values_list('pk', 'author_id', 'pub_date')
+    for post_id, author_id, pub_date in rows.iterator():
+        by_author[author_id].append((post_id, pub_date))
+    follows = Follow.objects.filter(author_id__in=by_author).values_list(
+        'user_id', 'author_id'
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id, author_id in follows.iterator()
+        for post_id, pub_date in by_author[author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    _bulk_insert(
+        _entries_for(user_id, Post.objects.filter(author_id=author_id))
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        author_id=author_id,
+    ).delete()
+
+
+def _followers(author_id):
+    return Follow.objects.filter(author_id=author_id).values('user_id')
+
+
+def backfill_author(author_id):
+    """Раскладывает все посты автора по лентам всех подписчиков."""
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list('pk', 'pub_date')
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=follower['user_id'],
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for follower in _followers(author_id).iterator()
+        for post_id, pub_date in posts
+    )
+
+
+def prune_author(author_id):
+    """Убирает посты автора из лент всех подписчиков."""
+    TimelineEntry.objects.filter(
+        user_id__in=_followers(author_id),
+        author_id=author_id,
+    ).delete()
+
+
+def follow(user_id, author_id):
+    """Обновляет ленты после подписки (счётчик автора уже увеличен)."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    followers = followers_count(author_id)
+    if followers == limit + 1:
+        # Автор только что перешёл порог: дальше его посты
+        # подмешиваются при чтении
+        prune_author(author_id)
+    elif followers <= limit:
+        backfill(user_id, author_id)
+
+
+def unfollow(user_id, author_id):
+    """Обновляет ленты после отписки (счётчик автора уже уменьшен)."""
+    prune(user_id, author_id)
+    if followers_count(author_id) == settings.TIMELINE_FANOUT_LIMIT:
+        # Автор вернулся под порог: в ленты попадают и посты,
+        # опубликованные, пока он читался при запросе
+        backfill_author(author_id)
+
+
+def follow_feed(user):
+    """Лента подписок для пагинатора, ключи сортировки — `feed_keys`.
+
+    Обычно это записи `TimelineEntry` читателя (id поста и дата).
+    Если среди подписок есть авторы без fan-out, это посты из ленты
+    и все посты этих авторов одним запросом.
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    live = list(live_authors(user.pk))
+    if not live:
+        return entries.only('post', 'pub_date')
+    return Post.objects.feed().filter(
+        Q(pk__in=entries.values('post_id')) | Q(author_id__in=live)
+    )
+
+
+def feed_keys(feed):
+    return TIMELINE_KEYS if feed.model is TimelineEntry else POST_KEYS
+
+
+def page_posts(objects):
+    """Посты страницы ленты подписок в порядке страницы."""
+    objects = list(objects)
+    if objects and isinstance(objects[0], TimelineEntry):
+        return hydrate(entry.post_id for entry in objects)
+    return objects
+
+
+def hydrate(post_ids):
+    """Загружает посты страницы одним запросом, сохраняя порядок id."""
+    post_ids = list(post_ids)
+    posts = Post.objects.feed().in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def rebuild(users=None):
+    """Пересобирает ленты с нуля; возвращает число записей."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.filter(
+        Q(author__stats__isnull=True)
+        | Q(author__stats__followers_count__lte=(
+            settings.TIMELINE_FANOUT_LIMIT
+        ))
+    )
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    # Читатели видят либо старые ленты, либо уже пересобранные
+    with transaction.atomic():
+        entries.delete()
+        for user_id, author_id in follows.values_list(
+            'user_id', 'author_id'
+        ).iterator():
+            backfill(user_id, author_id)
+        return entries.count()
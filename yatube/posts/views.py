@@ -1,34 +1,79 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
+from core.db_router import may_cache, pin_to_primary, read_from_replica
+from core.page_cache import cache_public_page
+from core.paginator import CursorPaginator
+from . import conditional, export, search, stats, timeline
+from .cache import (CachedCountPaginator, feed_generation, group_version,
+                    page_cache_key, post_version, profile_version)
 from .models import Post, Group, User, Comment, Follow
 from .forms import PostForm, CommentForm
 
 COUNT_ELEMS = 10
+FEED_KEYS = ('-pub_date', '-id')
+COMMENTS_PER_PAGE = 20
+COMMENT_KEYS = ('created', 'id')
+
+
+def get_page_obj(request, object_list, keys=FEED_KEYS,
+                 count_cache_key=None):
+    """Страница ленты: по номеру или по курсору `?after=`/`?before=`.
+
+    С `count_cache_key` число записей берётся из кэша ленты.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.FEED_PAGINATION == 'cursor' or after or before:
+        paginator = CursorPaginator(
+            object_list,
+            COUNT_ELEMS,
+            keys=keys,
+            count_timeout=settings.FEED_CURSOR_COUNT_TIMEOUT,
+        )
+        return paginator.get_page(after=after, before=before)
+    if count_cache_key is not None:
+        paginator = CachedCountPaginator(
+            object_list, COUNT_ELEMS, cache_key=count_cache_key
+        )
+    else:
+        paginator = Paginator(object_list, COUNT_ELEMS)
+    return paginator.get_page(request.GET.get('page'))
 
 
-@cache_page(20)
+@read_from_replica
+@condition(etag_func=conditional.index_etag)
+@cache_public_page(version=feed_generation)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, COUNT_ELEMS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = get_page_obj(request, post_list, count_cache_key='index')
+    feed_cache_key = page_cache_key(request, page_obj)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed_cache_key': feed_cache_key,
+        # Нулевой срок — фрагмент с реплики не сохраняется
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT if may_cache(
+            feed_generation()
+        ) else 0,
     }
     return render(request, template, context)
 
 
+@read_from_replica
+@condition(etag_func=conditional.group_etag)
+@cache_public_page(version=group_version)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, COUNT_ELEMS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.feed()
+    page_obj = get_page_obj(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -36,38 +81,110 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@read_from_replica
+@condition(etag_func=conditional.profile_etag)
+@cache_public_page(version=profile_version)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, COUNT_ELEMS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    if request.user.is_authenticated:
-        following = author.following.filter(user=request.user).exists()
-    else:
-        following = False
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    author_stats = stats.for_user(author)
+    post_list = author.posts.feed()
+    page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following
+        'author_stats': author_stats,
     }
     return render(request, template, context)
 
 
+@read_from_replica
+@cache_public_page(version=feed_generation)
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.search(query), COUNT_ELEMS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+@read_from_replica
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+@cache_public_page(version=post_version)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = Comment.objects.filter(post_id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id,
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'comments': comments,
+        'author_stats': stats.for_user(post.author),
+        'comments': get_comments_page(post_id),
         'form': form
     }
     return render(request, template, context)
 
 
+def get_comments_page(post_id, after=None):
+    """Страница комментариев по курсору, автор — в том же запросе."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('post', 'text', 'created', 'author__username')
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE, COMMENT_KEYS)
+    return paginator.get_page(after=after)
+
+
+@read_from_replica
+@cache_public_page(version=post_version)
+def post_comments(request, post_id):
+    """Фрагмент со следующей порцией комментариев для «Показать ещё»."""
+    template = 'posts/includes/comment_list.html'
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': get_comments_page(post_id, request.GET.get('after')),
+    }
+    return render(request, template, context)
+
+
+def export_response(request, posts, filename):
+    """Выгрузка постов потоком: `?format=jsonl|csv`, `?comments=1`."""
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    response = StreamingHttpResponse(
+        export.lines(posts, fmt, bool(request.GET.get('comments'))),
+        content_type=export.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{fmt}"'
+    )
+    return response
+
+
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    return export_response(request, author.posts.all(), author.username)
+
+
+def group_export(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), group.slug)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -117,12 +234,12 @@ def add_comment(request, post_id):
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, COUNT_ELEMS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    feed = timeline.follow_feed(request.user)
+    page_obj = get_page_obj(request, feed, keys=timeline.feed_keys(feed))
+    page_obj.object_list = timeline.page_posts(page_obj.object_list)
     context = {
         'page_obj': page_obj,
         'author': 'author',
@@ -131,14 +248,12 @@ def follow_index(request):
 
 
 @login_required
+@pin_to_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
         return redirect('posts:profile', username)
-    is_follow = request.user.follower.all().filter(author=author)
-    if is_follow.exists():
-        return redirect('posts:profile', username)
-    Follow.objects.create(
+    Follow.objects.get_or_create(
         user=request.user,
         author=author
     )
@@ -146,8 +261,10 @@ def profile_follow(request, username):
 
 
 @login_required
+@pin_to_primary
 def profile_unfollow(request, username):
-    author = User.objects.filter(username=username)
-    follower = Follow.objects.filter(author=author.first())
-    follower.delete()
+    Follow.objects.filter(
+        user=request.user,
+        author__username=username,
+    ).delete()
     return redirect('posts:profile', username)
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',
+    'core.db_router.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +97,45 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: пути к файлам SQLite через запятую
+# в YATUBE_REPLICAS. Локально реплику наполняет команда sync_replica
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_REPLICAS', '').split(','))
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Профиль базы из YATUBE_DB_PROFILE: 'production' — WAL, mmap,
+# кэш страниц, ожидание блокировок и постоянные соединения;
+# 'plain' — настройки SQLite по умолчанию, для сравнения в load_test
+DB_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'production')
+# Режим журнала хранится в самом файле базы, поэтому его
+# приходится возвращать явно
+SQLITE_PRAGMAS = {'journal_mode': 'DELETE'}
+if DB_PROFILE == 'production':
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # Отрицательное значение — размер в КиБ, а не в страницах
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+    }
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 60
+
+# Сколько секунд после записи посетитель читает с основной базы,
+# пока реплики её догоняют
+REPLICA_PIN_SECONDS = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -135,6 +176,15 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кто отдаёт байты медиафайлов после проверки в core.media:
+# '' — сам Django, 'x-accel' — nginx, 'x-sendfile' — Apache/lighttpd
+MEDIA_SENDFILE = os.environ.get('YATUBE_MEDIA_SENDFILE', '')
+# internal location nginx с alias на MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_PUBLIC_PREFIXES = ('posts/', 'cache/')
+# Сколько кэшировать медиафайлы, имя которых не хэш содержимого
+MEDIA_MAX_AGE = 60 * 60
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -145,8 +195,88 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Кэш в два уровня: LRU в памяти процесса поверх общего кэша.
+# Общий уровень — файлы в YATUBE_CACHE_DIR, общие для всех воркеров,
+# а без неё — LocMemCache как локальная замена
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+if os.environ.get('YATUBE_CACHE_DIR'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['YATUBE_CACHE_DIR'],
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_BYTES': 16 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 5,
+            # Поколение лент меняется на месте: его читают
+            # только из общего кэша
+            'SHARED_ONLY': ['posts:feed-generation'],
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+# Авторы, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписок при публикации: их посты дочитываются при запросе
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Постраничный вывод лент: 'page' — по номеру страницы,
+# 'cursor' — по курсору ?after=/?before= без COUNT(*) и OFFSET
+FEED_PAGINATION = 'page'
+# Сколько секунд кэшировать приблизительное число записей в режиме
+# курсора; None — не показывать число записей
+FEED_CURSOR_COUNT_TIMEOUT = 60
+
+# Сколько секунд хранить закэшированные ленты; при изменении постов
+# кэш сбрасывается сменой поколения, поэтому TTL может быть большим
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# Сколько секунд хранить целые страницы лент, профилей и постов;
+# сбрасываются вместе с кэшем лент при изменении данных
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Доля запросов, для которых ServerTimingMiddleware замеряет SQL,
+# шаблоны и кэш; для отдельных URL (по имени) долю можно задать
+# в SERVER_TIMING_SAMPLE_RATES, например {'posts:index': 0.1}
+SERVER_TIMING_SAMPLE_RATE = 0.01
+SERVER_TIMING_SAMPLE_RATES = {}
+# Отдавать заголовок Server-Timing всем посетителям; сотрудники
+# и INTERNAL_IPS получают его и без этого
+SERVER_TIMING_HEADER = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # В разработке замеры видны в заголовке, журнал не засоряем
+        'core.timing': {
+            'handlers': ['console'],
+            'level': 'WARNING' if DEBUG else 'INFO',
+        },
+    },
 }
+
+# Сколько секунд хранить отрендеренные карточки постов; ключ карточки
+# меняется вместе с её содержимым, поэтому TTL только чистит память
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Потоков для фоновой подготовки миниатюр после загрузки картинки;
+# 0 — готовить сразу после фиксации транзакции, в том же потоке
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки уменьшаются до этого размера и сохраняются
+# с этим качеством JPEG и WebP
+POST_IMAGE_MAX_SIZE = (2560, 2560)
+POST_IMAGE_QUALITY = 85